@@ -54,6 +54,7 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'GymManager.urls'
 
+# Bez jawnego 'loaders' Django używa cached.Loader (szablony kompilowane raz na proces)
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -85,6 +86,17 @@ DATABASES = {
 }
 
 
+# Cache fragmentów szablonów i znaczników wersji danych (core.versions).
+# Przy kilku procesach (gunicorn/uvicorn) potrzebny jest wspólny backend, np. Redis.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        # Domyślne 300 wpisów nie mieści wierszy recepcji przy tysiącach członków
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -127,8 +139,32 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Pliki (zdjęcia, paragony) zapisywane po skrócie treści - duplikaty zajmują miejsce raz
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.HashedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    # Paragony nie są publiczne - katalog poza MEDIA_ROOT, bez adresu URL
+    'receipts': {
+        'BACKEND': 'core.storage.HashedFileSystemStorage',
+        'OPTIONS': {'location': BASE_DIR / 'var' / 'private'},
+    },
+}
+
 LOGIN_REDIRECT_URL = 'dashboard'
 LOGOUT_REDIRECT_URL = 'home'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-TAILWIND_APP_NAME = 'theme'
\ No newline at end of file
+TAILWIND_APP_NAME = 'theme'
+
+# Odbiorcy zdarzeń z outboxa (komenda dispatch_outbox). NAME (domyślnie BACKEND) identyfikuje
+# odbiorcę przy śledzeniu dostarczeń - dwóch odbiorców tego samego typu potrzebuje własnych NAME, np.:
+# {'BACKEND': 'core.outbox.HttpSink', 'OPTIONS': {'url': 'http://127.0.0.1:8765/'}}
+# {'BACKEND': 'core.outbox.WebhookSink', 'OPTIONS': {'url': 'https://...', 'secret': '...'}}
+OUTBOX_SINKS = [
+    {'BACKEND': 'core.outbox.FileSink', 'OPTIONS': {'path': BASE_DIR / 'var' / 'outbox_events.jsonl'}},
+]
+
+# Dziennik działań personelu (core.audit): wpisy zapisywane paczkami co AUDIT_FLUSH_SECONDS
+# lub po AUDIT_BATCH_SIZE wpisach; AUDIT_BATCH_SIZE = 1 wyłącza buforowanie
+AUDIT_BATCH_SIZE = 50
+AUDIT_FLUSH_SECONDS = 2
@@ -0,0 +1,69 @@
+"""
+Production settings for GymManager.
+
+Use with DJANGO_SETTINGS_MODULE=GymManager.settings_production. Requires
+DJANGO_SECRET_KEY and DJANGO_ALLOWED_HOSTS (comma-separated) in the environment;
+DJANGO_CACHE_URL points at the shared Redis cache (default redis://127.0.0.1:6379/1).
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, INSTALLED_APPS, STORAGES
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+# Aplikacje potrzebne tylko przy pracy nad wyglądem (budowanie CSS, przeładowanie
+# przeglądarki) - bez nich worker startuje szybciej i zajmuje mniej pamięci
+DEV_APPS = {'tailwind', 'theme', 'django_browser_reload'}
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in DEV_APPS]
+
+# Zbudowany CSS z katalogu theme zbiera collectstatic
+STATICFILES_DIRS = [BASE_DIR / 'theme' / 'static']
+STATIC_ROOT = BASE_DIR / 'staticfiles'
+
+# Cache wspólny dla wszystkich workerów - znaczniki wersji (core.versions), fragmenty szablonów
+# i model prognoz muszą być widoczne w każdym procesie, inaczej workery serwują nieaktualne dane
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_URL', 'redis://127.0.0.1:6379/1'),
+        'KEY_PREFIX': 'gymmanager',
+    }
+}
+
+# Pliki użytkowników w S3 lub zgodnym magazynie (MinIO, Ceph, R2), gdy podano bucket.
+# Dane dostępowe boto3 bierze ze zmiennych AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY.
+if os.environ.get('MEDIA_S3_BUCKET'):
+    STORAGES = {
+        **STORAGES,
+        'default': {
+            'BACKEND': 'core.storage_s3.HashedS3Storage',
+            'OPTIONS': {
+                'bucket_name': os.environ['MEDIA_S3_BUCKET'],
+                'endpoint_url': os.environ.get('MEDIA_S3_ENDPOINT_URL'),
+                'custom_domain': os.environ.get('MEDIA_S3_CUSTOM_DOMAIN'),
+                'default_acl': None,
+                'querystring_auth': True,
+            },
+        },
+        # Paragony pod osobnym prefiksem, bez publicznej domeny - serwuje je tylko widok order_receipt
+        'receipts': {
+            'BACKEND': 'core.storage_s3.HashedS3Storage',
+            'OPTIONS': {
+                'bucket_name': os.environ['MEDIA_S3_BUCKET'],
+                'endpoint_url': os.environ.get('MEDIA_S3_ENDPOINT_URL'),
+                'location': 'private',
+                'default_acl': 'private',
+                'querystring_auth': True,
+            },
+        },
+    }
+
+# Ciasteczka sesji i CSRF tylko po HTTPS (TLS kończy się na proxy)
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
@@ -17,7 +17,8 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from core.views import home, register, dashboard, membership_list, purchase_membership, reception_panel, toggle_visit, \
-    class_schedule, create_class, signup_for_class, delete_class, signout_from_class, admin_dashboard
+    class_schedule, create_class, signup_for_class, delete_class, signout_from_class, admin_dashboard, \
+    analytics_report, reception_events, corporate_purchase, order_receipt, audit_log
 from django.contrib.auth import views as auth_views
 from django.conf import settings
 from django.conf.urls.static import static
@@ -32,16 +33,22 @@ urlpatterns = [
     path('login/', auth_views.LoginView.as_view(template_name='core/login.html'), name='login'),
     path('memberships/', membership_list, name='membership_list'),
     path('memberships/buy/<int:membership_id>/', purchase_membership, name='purchase_membership'),
+    path('memberships/corporate/', corporate_purchase, name='corporate_purchase'),
+    path('orders/<int:order_id>/receipt/', order_receipt, name='order_receipt'),
     path('reception/', reception_panel, name='reception_panel'),
     path('reception/toggle/<int:user_id>/', toggle_visit, name='toggle_visit'),
+    path('reception/events/', reception_events, name='reception_events'),
     path('schedule/', class_schedule, name='class_schedule'),
     path('schedule/add/', create_class, name='create_class'),
     path('schedule/delete/<int:class_id>/', delete_class, name='delete_class'),
     path('schedule/signup/<int:class_id>/', signup_for_class, name='signup_for_class'),
     path('schedule/signout/<int:class_id>/', signout_from_class, name='signout_from_class'),
     path('admin-dashboard/', admin_dashboard, name='admin_dashboard'),
-    path("__reload__/", include("django_browser_reload.urls")),
+    path('admin-dashboard/analytics/', analytics_report, name='analytics_report'),
+    path('admin-dashboard/audit/', audit_log, name='audit_log'),
 ]
 
+# Narzędzia deweloperskie - profil produkcyjny (DEBUG = False) ich nie importuje
 if settings.DEBUG:
+    urlpatterns += [path("__reload__/", include("django_browser_reload.urls"))]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,48 +1,218 @@
 from django.contrib import admin
-from .models import MembershipType, UserMembership, ClassSessions, Enrollments, Profile, Visit
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils.html import format_html
+from django.utils.functional import cached_property
+
+from . import audit
+from .groups import current_week_start
+from .models import MembershipType, UserMembership, ClassSessions, Enrollments, Profile, Visit, OutboxEvent, Order, GroupAccount, \
+    AuditLog
+
+
+# Paginator dla dużych tabel: bez filtrów zwraca szacowaną liczbę wierszy
+# zamiast pełnego COUNT(*), który przy milionach wizyt trwa zbyt długo
+class EstimatedCountPaginator(Paginator):
+    estimate_threshold = 100_000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, 'query', None)
+        if query is None or query.where:
+            return super().count
+        estimate = estimate_row_count(self.object_list.model, self.object_list.db)
+        if estimate is None or estimate < self.estimate_threshold:
+            return super().count
+        return estimate
+
+
+def estimate_row_count(model, using='default'):
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [table])
+        elif connection.vendor == 'sqlite':
+            # MAX(id) czyta tylko koniec indeksu klucza głównego
+            cursor.execute(f"SELECT MAX({connection.ops.quote_name(model._meta.pk.column)}) "
+                           f"FROM {connection.ops.quote_name(table)}")
+        else:
+            return None
+        row = cursor.fetchone()
+    if not row or row[0] is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+# Zmiany wprowadzane w panelu trafiają do dziennika działań (core.audit)
+class AuditedModelAdmin(admin.ModelAdmin):
+    def audit_member(self, obj):
+        return getattr(obj, 'user', None)
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        audit.record(request.user, 'admin.change' if change else 'admin.add', member=self.audit_member(obj), obj=obj,
+                     repr=str(obj), fields=list(form.changed_data))
+
+    def delete_model(self, request, obj):
+        audit.record(request.user, 'admin.delete', member=self.audit_member(obj), obj=obj, repr=str(obj))
+        super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            audit.record(request.user, 'admin.delete', member=self.audit_member(obj), obj=obj, repr=str(obj))
+        super().delete_queryset(request, queryset)
 
 
 # Rejestracja Typu Karnetu
 @admin.register(MembershipType)
-class MembershipTypeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'price', 'duration_days')
+class MembershipTypeAdmin(AuditedModelAdmin):
+    list_display = ('name', 'price', 'duration_days', 'entries_per_week', 'classes_per_day')
     search_fields = ('name',)
 
 # Rejestracja Karnetu Użytkownika
 @admin.register(UserMembership)
-class UserMembershipAdmin(admin.ModelAdmin):
-    list_display = ('user', 'membership_type', 'expiration_date', 'is_active')
+class UserMembershipAdmin(AuditedModelAdmin):
+    list_display = ('user', 'membership_type', 'group', 'price', 'expiration_date', 'is_active')
     list_filter = ('is_active', 'membership_type')
+    list_select_related = ('user', 'membership_type', 'group')
     search_fields = ('user__username', 'user__email')
-    readonly_fields = ('purchase_date',)
+    readonly_fields = ('purchase_date', 'order')
+
+# Rejestracja Kont grupowych
+@admin.register(GroupAccount)
+class GroupAccountAdmin(AuditedModelAdmin):
+    list_display = ('name', 'kind', 'entries_per_week', 'get_remaining_entries')
+    list_filter = ('kind',)
+    search_fields = ('name__startswith',)
+
+    # Wykorzystanie puli w bieżącym tygodniu w tym samym zapytaniu co lista, bez zapytania na wiersz
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(week_used=Coalesce(
+            Sum('pool_shards__used', filter=Q(pool_shards__week_start=current_week_start())), 0
+        ))
+
+    @admin.display(description='Pozostało w tym tygodniu')
+    def get_remaining_entries(self, obj):
+        return obj.entries_per_week - obj.week_used
+
+# Rejestracja Zamówień
+@admin.register(Order)
+class OrderAdmin(AuditedModelAdmin):
+    list_display = ('id', 'buyer', 'membership_name', 'quantity', 'total_price', 'company_name', 'receipt_status', 'created_at')
+    list_filter = ('receipt_status',)
+    list_select_related = ('buyer',)
+    search_fields = ('buyer__username__startswith', 'company_name__startswith')
+    readonly_fields = ('buyer', 'idempotency_key', 'membership_type', 'membership_name', 'unit_price', 'duration_days',
+                       'quantity', 'total_price', 'created_at', 'get_receipt_link', 'receipt_attempts', 'receipt_error')
+    exclude = ('receipt',)
+    ordering = ('-id',)
+
+    # Paragon nie ma publicznego adresu - link prowadzi do widoku zamówienia
+    @admin.display(description='Paragon')
+    def get_receipt_link(self, obj):
+        if obj.receipt_status != Order.RECEIPT_READY:
+            return obj.get_receipt_status_display()
+        return format_html('<a href="{}">Pobierz</a>', reverse('order_receipt', args=[obj.id]))
 
 # Rejestracja Zajęć
 @admin.register(ClassSessions)
-class ClassSessionAdmin(admin.ModelAdmin):
-    list_display = ('name', 'date', 'capacity', 'get_participants_count')
-    list_filter = ('date',)
+class ClassSessionAdmin(AuditedModelAdmin):
+    list_display = ('name', 'date', 'duration_minutes', 'room', 'capacity', 'get_participants_count', 'deleted_at')
+    list_filter = ('date', 'room', ('deleted_at', admin.EmptyFieldListFilter))
+    search_fields = ('name__startswith',)
     date_hierarchy = 'date'
 
+    def get_queryset(self, request):
+        # Panel pokazuje też usunięte zajęcia (filtr "Usunięto")
+        queryset = ClassSessions.all_objects.annotate(participants_count=Count('enrollments'))
+        ordering = self.get_ordering(request)
+        return queryset.order_by(*ordering) if ordering else queryset
+
+    # Usunięcie z panelu jest miękkie, tak jak w grafiku - zapisy zostają w bazie.
+    # Ponowne usunięcie już usuniętych zajęć niczego nie zmienia i nie trafia do dziennika
+    def delete_model(self, request, obj):
+        if obj.deleted_at is not None:
+            return
+        audit.record(request.user, 'admin.delete', obj=obj, repr=str(obj))
+        obj.soft_delete()
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset.filter(deleted_at__isnull=True):
+            self.delete_model(request, obj)
+
+    # Strona potwierdzenia pokazuje same zajęcia - zapisy nie są kasowane kaskadowo
+    def get_deleted_objects(self, objs, request):
+        objs = [obj for obj in objs if obj.deleted_at is None]
+        perms_needed = set() if self.has_delete_permission(request) else {self.opts.verbose_name}
+        return [str(obj) for obj in objs], {self.opts.verbose_name_plural: len(objs)}, perms_needed, []
+
+    @admin.display(description='Zapisanych', ordering='participants_count')
     def get_participants_count(self, obj):
-        return obj.participants.count()
-    get_participants_count.short_description = 'Zapisanych'
+        return obj.participants_count
 
 # Rejestracja Zapisów
 @admin.register(Enrollments)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(AuditedModelAdmin):
     list_display = ('user', 'class_session', 'signup_date')
     list_filter = ('class_session__name',)
+    list_select_related = ('user', 'class_session')
+    search_fields = ('user__username__startswith', 'class_session__name__startswith')
+    raw_id_fields = ('user', 'class_session')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 # Rejestracja Profilu (zdjęcie)
 @admin.register(Profile)
-class ProfileAdmin(admin.ModelAdmin):
+class ProfileAdmin(AuditedModelAdmin):
     list_display = ('user', 'pesel', 'photo')
+    list_select_related = ('user',)
     readonly_fields = ('card_number',)
     search_fields = ('user__username', 'pesel', 'card_number')
 
 @admin.register(Visit)
-class VisitAdmin(admin.ModelAdmin):
+class VisitAdmin(AuditedModelAdmin):
     list_display = ['user', 'entry_time', 'exit_time']
     list_filter = ['entry_time', 'exit_time']
-    search_fields = ['user__username', 'user__first_name', 'user__last_name']
-    ordering = ['-entry_time']
\ No newline at end of file
+    list_select_related = ['user']
+    # Wyszukiwanie po prefiksie (loginu, imienia, nazwiska) zamiast LIKE '%...%' na całej tabeli wizyt
+    search_fields = ['user__username__startswith', 'user__first_name__istartswith', 'user__last_name__istartswith']
+    raw_id_fields = ['user']
+    ordering = ['-entry_time']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(OutboxEvent)
+class OutboxEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'event_type', 'object_id', 'status', 'attempts', 'created_at', 'sent_at']
+    list_filter = ['status', 'event_type']
+    readonly_fields = ['event_type', 'object_id', 'payload', 'created_at', 'sent_at', 'attempts', 'last_error',
+                       'delivered_to']
+    ordering = ['-id']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+# Dziennik tylko do odczytu - wpisów nie można dodać, zmienić ani usunąć
+@admin.register(AuditLog)
+class AuditLogAdmin(admin.ModelAdmin):
+    list_display = ['created_at', 'actor_name', 'action', 'member_name', 'object_type', 'object_id']
+    list_filter = ['action']
+    search_fields = ['actor_name__startswith', 'member_name__startswith']
+    readonly_fields = ['created_at', 'actor', 'actor_name', 'member', 'member_name', 'action', 'object_type', 'object_id',
+                       'details']
+    date_hierarchy = 'created_at'
+    ordering = ['-created_at']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,208 @@
+from datetime import date, datetime, time, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import F
+from django.db.models.functions import ExtractHour, TruncDate
+from django.utils import timezone
+
+from .models import Visit, Enrollments, UserMembership, ClassSessions, MembershipType
+
+ANALYTICS_WEEKS = 12
+CACHE_TIMEOUT = 60 * 60 * 24
+WEEKDAYS = ['Pon', 'Wt', 'Śr', 'Czw', 'Pt', 'Sob', 'Nd']
+
+# Klucz złożony (użytkownik, tydzień) mieści się w int64 dla dowolnych id
+_ORDINAL_SPAN = 10 ** 7
+
+
+def _ordinals(dates):
+    return np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+
+
+def _week_start(ordinals):
+    # date(1, 1, 1).toordinal() == 1 i to był poniedziałek
+    return ordinals - (ordinals - 1) % 7
+
+
+def _columns(rows, width):
+    if not rows:
+        return [np.empty(0, dtype=np.int64) for _ in range(width)]
+    return list(zip(*rows))
+
+
+def visit_heatmap(start, end):
+    rows = list(
+        Visit.objects.filter(entry_time__gte=start, entry_time__lt=end)
+        .annotate(day=TruncDate('entry_time'), hour=ExtractHour('entry_time'))
+        .values_list('day', 'hour')
+    )
+    days, hours = _columns(rows, 2)
+    weekdays = (_ordinals(days) - 1) % 7
+    hours = np.asarray(hours, dtype=np.int64)
+    heatmap = np.bincount(weekdays * 24 + hours, minlength=7 * 24).reshape(7, 24)
+    return heatmap
+
+
+def visit_durations(start, end):
+    rows = list(
+        Visit.objects.filter(entry_time__gte=start, entry_time__lt=end, exit_time__isnull=False)
+        .annotate(duration=F('exit_time') - F('entry_time'))
+        .values_list('duration', flat=True)
+    )
+    seconds = np.fromiter((d.total_seconds() for d in rows), dtype=np.float64, count=len(rows))
+    if not seconds.size:
+        return {'count': 0, 'mean_minutes': None, 'median_minutes': None}
+    return {
+        'count': int(seconds.size),
+        'mean_minutes': round(float(seconds.mean()) / 60, 1),
+        'median_minutes': round(float(np.median(seconds)) / 60, 1),
+    }
+
+
+def membership_usage(start, end):
+    # Pełne tygodnie (od poniedziałku) w oknie raportu
+    start_ordinal = int(_week_start(np.int64(timezone.localdate(start).toordinal())))
+    end_ordinal = int(_week_start(np.int64(timezone.localdate(end).toordinal() - 1)))
+    start_date = date.fromordinal(start_ordinal)
+    # Granica jako datetime (nie entry_time__date) - filtr korzysta z indeksu na entry_time
+    window_start = timezone.make_aware(datetime.combine(start_date, time.min))
+
+    visit_rows = list(
+        Visit.objects.filter(entry_time__gte=window_start, entry_time__lt=end)
+        .annotate(day=TruncDate('entry_time'))
+        .values_list('user_id', 'day')
+    )
+    membership_rows = list(
+        UserMembership.objects.filter(
+            is_active=True,
+            membership_type__isnull=False,
+            expiration_date__gte=start_date,
+            purchase_date__lt=end.date(),
+        ).values_list('user_id', 'membership_type_id', 'purchase_date', 'expiration_date')
+    )
+    if not membership_rows:
+        return []
+
+    m_user, m_type, m_purchase, m_expiration = _columns(membership_rows, 4)
+    m_user = np.asarray(m_user, dtype=np.int64)
+    m_type = np.asarray(m_type, dtype=np.int64)
+    m_purchase = _ordinals(m_purchase)
+    m_expiration = _ordinals(m_expiration)
+
+    # Liczba tygodni karnetu w oknie raportu (mianownik średniej)
+    first_week = np.maximum(_week_start(m_purchase), start_ordinal)
+    last_week = np.minimum(_week_start(m_expiration), end_ordinal)
+    membership_weeks = np.clip((last_week - first_week) // 7 + 1, 0, None)
+
+    # Wejścia zliczone per (użytkownik, tydzień)
+    v_user, v_day = _columns(visit_rows, 2)
+    v_user = np.asarray(v_user, dtype=np.int64)
+    v_week = _week_start(_ordinals(v_day))
+    user_weeks, week_counts = np.unique(v_user * _ORDINAL_SPAN + v_week, return_counts=True)
+    uw_user = user_weeks // _ORDINAL_SPAN
+    uw_week = user_weeks % _ORDINAL_SPAN
+
+    # Dopasowanie tygodnia do najnowszego karnetu kupionego przed jego końcem
+    order = np.lexsort((m_purchase, m_user))
+    sorted_keys = m_user[order] * _ORDINAL_SPAN + m_purchase[order]
+    idx = np.searchsorted(sorted_keys, uw_user * _ORDINAL_SPAN + uw_week + 6, side='right') - 1
+    idx_clipped = np.clip(idx, 0, None)
+    matched = order[idx_clipped]
+    valid = (idx >= 0) & (m_user[matched] == uw_user) & (m_expiration[matched] >= uw_week)
+
+    type_ids, type_inverse = np.unique(m_type, return_inverse=True)
+    weeks_per_type = np.bincount(type_inverse, weights=membership_weeks, minlength=type_ids.size)
+    members_per_type = np.bincount(type_inverse, minlength=type_ids.size)
+    matched_type = type_inverse[matched[valid]]
+    entries_per_type = np.bincount(matched_type, weights=week_counts[valid], minlength=type_ids.size)
+
+    types = MembershipType.objects.in_bulk(type_ids.tolist())
+    limits = np.array(
+        [types[t].entries_per_week or 0 for t in type_ids.tolist()], dtype=np.int64
+    )
+    at_limit = (limits[matched_type] > 0) & (week_counts[valid] >= limits[matched_type])
+    at_limit_per_type = np.bincount(matched_type, weights=at_limit, minlength=type_ids.size)
+
+    report = []
+    for i, type_id in enumerate(type_ids.tolist()):
+        weeks = float(weeks_per_type[i])
+        avg = entries_per_type[i] / weeks if weeks else 0.0
+        limit = int(limits[i]) or None
+        report.append({
+            'membership_type': types[type_id],
+            'members': int(members_per_type[i]),
+            'entries_per_week': limit,
+            'avg_entries': round(float(avg), 2),
+            'utilisation': round(float(avg) / limit * 100, 1) if limit else None,
+            'weeks_at_limit': round(float(at_limit_per_type[i]) / weeks * 100, 1) if weeks and limit else None,
+        })
+    return report
+
+
+def class_fill_rates(start, end):
+    session_rows = list(
+        ClassSessions.objects.filter(date__gte=start, date__lt=end).values_list('id', 'name', 'capacity')
+    )
+    if not session_rows:
+        return []
+    s_id, s_name, s_capacity = _columns(session_rows, 3)
+    s_id = np.asarray(s_id, dtype=np.int64)
+    s_capacity = np.asarray(s_capacity, dtype=np.float64)
+
+    enrolled = np.asarray(
+        Enrollments.objects.filter(class_session__in=s_id.tolist()).values_list('class_session_id', flat=True),
+        dtype=np.int64,
+    )
+    order = np.argsort(s_id)
+    positions = order[np.searchsorted(s_id, enrolled, sorter=order)]
+    counts = np.bincount(positions, minlength=s_id.size)
+    fill = np.divide(counts, s_capacity, out=np.zeros_like(s_capacity), where=s_capacity > 0)
+
+    names, name_inverse = np.unique(np.asarray(s_name, dtype=object), return_inverse=True)
+    sessions = np.bincount(name_inverse, minlength=names.size)
+    mean_fill = np.bincount(name_inverse, weights=fill, minlength=names.size) / sessions
+    full = np.bincount(name_inverse, weights=fill >= 1, minlength=names.size)
+
+    report = [
+        {
+            'name': name,
+            'sessions': int(sessions[i]),
+            'fill_rate': round(float(mean_fill[i]) * 100, 1),
+            'full_sessions': int(full[i]),
+        }
+        for i, name in enumerate(names.tolist())
+    ]
+    return sorted(report, key=lambda row: row['fill_rate'], reverse=True)
+
+
+def build_report(today):
+    end = timezone.make_aware(datetime.combine(today, time.min))
+    start = end - timedelta(weeks=ANALYTICS_WEEKS)
+
+    heatmap = visit_heatmap(start, end)
+    peak = int(heatmap.max()) if heatmap.size else 0
+    return {
+        'generated_for': today,
+        'weeks': ANALYTICS_WEEKS,
+        'heatmap': [
+            {
+                'weekday': WEEKDAYS[d],
+                'cells': [
+                    {'hour': h, 'count': int(c), 'intensity': round(c / peak, 2) if peak else 0}
+                    for h, c in enumerate(heatmap[d].tolist())
+                ],
+            }
+            for d in range(7)
+        ],
+        'durations': visit_durations(start, end),
+        'memberships': membership_usage(start, end),
+        'classes': class_fill_rates(start, end),
+    }
+
+
+# Raport liczony raz dziennie, z danych do północy poprzedniego dnia
+def get_daily_report(today=None):
+    today = today or timezone.localdate()
+    key = f'analytics:report:{today.isoformat()}'
+    return cache.get_or_set(key, lambda: build_report(today), CACHE_TIMEOUT)
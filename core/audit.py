@@ -0,0 +1,111 @@
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import connection
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# Wpisy dziennika zbierane w pamięci procesu i zapisywane paczkami (bulk_create) - akcja na recepcji
+# nie czeka na osobny INSERT. Bufor opróżnia wątek w tle co AUDIT_FLUSH_SECONDS albo po
+# AUDIT_BATCH_SIZE wpisach; AUDIT_BATCH_SIZE = 1 oznacza zapis od razu.
+# Przy twardym zabiciu procesu można stracić wpisy z ostatniego okresu opróżniania.
+
+_buffer = []
+_lock = threading.Lock()
+_wakeup = threading.Event()
+_flusher_pid = None
+
+
+def batch_size():
+    return getattr(settings, 'AUDIT_BATCH_SIZE', 50)
+
+
+def flush_seconds():
+    return getattr(settings, 'AUDIT_FLUSH_SECONDS', 2)
+
+
+def record(actor, action, member=None, obj=None, **details):
+    entry = AuditLog(
+        actor=actor,
+        actor_name=actor.get_username() if actor is not None else "",
+        member=member,
+        member_name=member.get_username() if member is not None else "",
+        action=action,
+        object_type=obj._meta.model_name if obj is not None else "",
+        object_id=str(obj.pk) if obj is not None else "",
+        details=details,
+    )
+    if batch_size() <= 1:
+        AuditLog.objects.bulk_create([entry])
+        return
+    with _lock:
+        _buffer.append(entry)
+        full = len(_buffer) >= batch_size()
+    _ensure_flusher()
+    if full:
+        _wakeup.set()
+
+
+def flush():
+    with _lock:
+        entries = _buffer[:]
+        del _buffer[:]
+    if not entries:
+        return 0
+    try:
+        AuditLog.objects.bulk_create(entries, batch_size=500)
+    except Exception:
+        # Wpisy wracają na początek bufora - kolejna próba przy następnym opróżnieniu
+        with _lock:
+            _buffer[:0] = entries
+        raise
+    return len(entries)
+
+
+def _run_flusher():
+    while True:
+        _wakeup.wait(flush_seconds())
+        _wakeup.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Nie udało się zapisać dziennika zdarzeń")
+        finally:
+            # Wątek ma własne połączenie z bazą - nie trzymamy go między paczkami
+            connection.close()
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    # Po fork (np. workery gunicorna) wątek rodzica nie istnieje - każdy proces startuje własny
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_run_flusher, name='audit-flusher', daemon=True).start()
+
+
+def _reset_after_fork():
+    # Wpisy rodzica zapisze rodzic - dziecko zaczyna z pustym buforem
+    global _lock
+    _lock = threading.Lock()
+    del _buffer[:]
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception("Nie udało się zapisać dziennika zdarzeń przy zamykaniu procesu")
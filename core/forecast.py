@@ -0,0 +1,165 @@
+from datetime import datetime, time, timedelta
+
+import numpy as np
+from django.core.cache import cache
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import ClassSessions, Enrollments
+
+CACHE_TIMEOUT = 60 * 60 * 24
+# Krzywa zapełniania: jaka część końcowej liczby zapisów jest już zapisana
+# na N godzin przed zajęciami, w przedziałach co BIN_HOURS do HORIZON_DAYS
+BIN_HOURS = 6
+HORIZON_DAYS = 14
+BINS = HORIZON_DAYS * 24 // BIN_HOURS
+# Ile zapisów "waży" krzywa globalna przy zajęciach z krótką historią
+PRIOR_SIGNUPS = 20
+# Popyt wyprzedanych zajęć szacujemy z krzywej, ale najwyżej jako wielokrotność limitu
+MAX_DEMAND_FACTOR = 3
+TIMETABLE_DAYS = 14
+
+
+def _timestamps(datetimes):
+    return np.fromiter((d.timestamp() for d in datetimes), dtype=np.float64, count=len(datetimes))
+
+
+def _lead_bins(lead_hours):
+    return np.clip(np.floor(lead_hours / BIN_HOURS), 0, BINS - 1).astype(np.int64)
+
+
+def _suffix_share(counts):
+    # counts[..., b] - zapisy dokonane b przedziałów przed startem;
+    # suma od b do końca = ile osób było zapisanych na b przedziałów przed startem
+    return np.cumsum(counts[..., ::-1], axis=-1)[..., ::-1]
+
+
+def learn_model(until):
+    session_rows = list(ClassSessions.objects.filter(date__lt=until).values_list('id', 'name', 'capacity'))
+    if not session_rows:
+        return None
+    s_id, s_name, s_capacity = (np.asarray(column) for column in zip(*session_rows))
+    s_id = s_id.astype(np.int64)
+    s_capacity = s_capacity.astype(np.float64)
+    names, name_index = np.unique(s_name.astype(str), return_inverse=True)
+
+    enrollment_rows = list(
+        Enrollments.objects.filter(starts_at__lt=until, class_session__deleted_at__isnull=True).values_list('class_session_id', 'starts_at', 'signup_date')
+    )
+    if enrollment_rows:
+        e_session, e_start, e_signup = zip(*enrollment_rows)
+        order = np.argsort(s_id)
+        positions = order[np.searchsorted(s_id, np.asarray(e_session, dtype=np.int64), sorter=order)]
+        lead_hours = np.maximum(_timestamps(e_start) - _timestamps(e_signup), 0) / 3600
+    else:
+        positions = np.empty(0, dtype=np.int64)
+        lead_hours = np.empty(0, dtype=np.float64)
+    bins = _lead_bins(lead_hours)
+    enrolled = np.bincount(positions, minlength=s_id.size).astype(np.float64)
+    sold_out = (s_capacity > 0) & (enrolled >= s_capacity)
+
+    # Krzywe dla każdej nazwy zajęć i globalna, ściągnięte do globalnej przy małej liczbie zapisów.
+    # Uczymy je tylko na zajęciach bez kompletu - u wyprzedanych zapisy urywają się na limicie
+    uncensored = ~sold_out[positions]
+    counts = np.bincount(
+        name_index[positions[uncensored]] * BINS + bins[uncensored], minlength=names.size * BINS
+    ).reshape(names.size, BINS)
+    totals = counts.sum(axis=1)
+    global_counts = counts.sum(axis=0)
+    global_curve = _suffix_share(global_counts) / global_counts.sum() if global_counts.sum() else np.ones(BINS)
+    curves = (_suffix_share(counts) + PRIOR_SIGNUPS * global_curve) / (totals + PRIOR_SIGNUPS)[:, None]
+
+    # Wyprzedane zajęcia nie pokazują prawdziwego popytu - dzielimy wynik przez część krzywej,
+    # która "zdążyła się wydarzyć" do ostatniego zapisu
+    last_lead = np.full(s_id.size, BINS - 1, dtype=np.int64)
+    np.minimum.at(last_lead, positions, bins)
+    share_at_sellout = curves[name_index, last_lead]
+    demand = np.where(
+        sold_out,
+        np.minimum(enrolled / np.maximum(share_at_sellout, 1e-6), s_capacity * MAX_DEMAND_FACTOR),
+        enrolled,
+    )
+
+    sessions = np.bincount(name_index, minlength=names.size)
+    return {
+        'names': names,
+        'curves': curves,
+        'global_curve': global_curve,
+        'demand': np.bincount(name_index, weights=demand, minlength=names.size) / sessions,
+        'global_demand': float(demand.mean()),
+        'sessions': sessions,
+    }
+
+
+# Model uczony raz dziennie na całej historii do północy
+def get_model(today=None):
+    today = today or timezone.localdate()
+    until = timezone.make_aware(datetime.combine(today, time.min))
+    return cache.get_or_set(f'forecast:model:{today.isoformat()}', lambda: learn_model(until), CACHE_TIMEOUT)
+
+
+def score_sessions(model, names, starts, capacities, enrolled, now):
+    if model is None or not len(names):
+        return [None] * len(names)
+    capacities = np.asarray(capacities, dtype=np.float64)
+    enrolled = np.asarray(enrolled, dtype=np.float64)
+    lead_hours = (_timestamps(starts) - now.timestamp()) / 3600
+    now_bin = _lead_bins(lead_hours)
+
+    names = np.asarray(names, dtype=str)
+    index = np.minimum(np.searchsorted(model['names'], names), model['names'].size - 1)
+    known = model['names'][index] == names
+    curves = np.where(known[:, None], model['curves'][index], model['global_curve'])
+    prior = np.where(known, model['demand'][index], model['global_demand'])
+    history = np.where(known, model['sessions'][index], 0)
+
+    # Oczekiwany wynik = obecni zapisani + zapisy, które wg krzywej jeszcze przyjdą
+    share_now = curves[np.arange(names.size), now_bin]
+    demand = enrolled + prior * (1 - share_now)
+    predicted = np.minimum(demand, capacities)
+
+    # Wyprzedanie: najwcześniejszy przedział (największe wyprzedzenie, ale nie w przeszłości),
+    # w którym oczekiwana liczba zapisów osiąga limit
+    expected = enrolled[:, None] + prior[:, None] * (curves - share_now[:, None])
+    future = np.arange(BINS)[None, :] <= now_bin[:, None]
+    sellout_bin = np.where((expected >= capacities[:, None]) & future, np.arange(BINS)[None, :], -1).max(axis=1)
+
+    results = []
+    for i, start in enumerate(starts):
+        is_full = bool(enrolled[i] >= capacities[i])
+        sellout_at = None
+        if not is_full and sellout_bin[i] >= 0:
+            sellout_at = max(start - timedelta(hours=int(sellout_bin[i]) * BIN_HOURS), now)
+        results.append({
+            'predicted': int(round(predicted[i])),
+            'fill_rate': round(float(predicted[i] / capacities[i]) * 100) if capacities[i] else 0,
+            'demand': round(float(prior[i]), 1),
+            'history': int(history[i]),
+            'is_full': is_full,
+            'sellout_at': sellout_at,
+        })
+    return results
+
+
+def forecast_session(session, enrolled=0, now=None):
+    now = now or timezone.now()
+    return score_sessions(get_model(), [session.name], [session.date], [session.capacity], [enrolled], now)[0]
+
+
+# Cały nadchodzący grafik w jednym przebiegu: jedno zapytanie i obliczenia na tablicach
+def forecast_timetable(days=TIMETABLE_DAYS, now=None):
+    now = now or timezone.now()
+    sessions = list(
+        ClassSessions.objects.filter(date__gte=now, date__lt=now + timedelta(days=days))
+        .annotate(enrolled_count=Count('enrollments'))
+        .order_by('date')
+    )
+    scores = score_sessions(
+        get_model(),
+        [s.name for s in sessions],
+        [s.date for s in sessions],
+        [s.capacity for s in sessions],
+        [s.enrolled_count for s in sessions],
+        now,
+    )
+    return [{'session': session, 'forecast': score} for session, score in zip(sessions, scores)]
@@ -1,7 +1,10 @@
+import re
+
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
-from .models import Profile, ClassSessions
+from .models import Profile, ClassSessions, MembershipType, GroupAccount
+from .orders import MAX_ORDER_QUANTITY
 
 
 class SignUpForm(UserCreationForm):
@@ -42,8 +45,84 @@ class ClassSessionForm(forms.ModelForm):
 
     class Meta:
         model = ClassSessions
-        fields = ['name', 'date', 'capacity']
+        fields = ['name', 'date', 'duration_minutes', 'room', 'capacity']
         widgets = {
             'name': forms.TextInput(attrs={'class': 'shadow border rounded w-full py-2 px-3'}),
+            'duration_minutes': forms.NumberInput(attrs={'class': 'shadow border rounded w-full py-2 px-3'}),
+            'room': forms.TextInput(attrs={'class': 'shadow border rounded w-full py-2 px-3'}),
             'capacity': forms.NumberInput(attrs={'class': 'shadow border rounded w-full py-2 px-3'}),
-        }
\ No newline at end of file
+        }
+
+class CorporatePurchaseForm(forms.Form):
+    membership_type = forms.ModelChoiceField(
+        queryset=MembershipType.objects.all(),
+        label="Rodzaj karnetu",
+        widget=forms.Select(attrs={'class': 'shadow border rounded w-full py-2 px-3'})
+    )
+    company_name = forms.CharField(
+        max_length=200,
+        label="Firma",
+        widget=forms.TextInput(attrs={'class': 'shadow border rounded w-full py-2 px-3'})
+    )
+    group = forms.ModelChoiceField(
+        queryset=GroupAccount.objects.all(),
+        required=False,
+        label="Konto grupowe (wspólna pula wejść)",
+        widget=forms.Select(attrs={'class': 'shadow border rounded w-full py-2 px-3'})
+    )
+    recipients = forms.CharField(
+        label="Użytkownicy (nazwy, po jednej w linii)",
+        widget=forms.Textarea(attrs={'class': 'shadow border rounded w-full py-2 px-3 font-mono', 'rows': 10})
+    )
+    idempotency_key = forms.CharField(max_length=64, widget=forms.HiddenInput)
+
+    def clean_recipients(self):
+        usernames = list(dict.fromkeys(name for name in re.split(r'[\s,;]+', self.cleaned_data['recipients']) if name))
+        if not usernames:
+            raise forms.ValidationError("Podaj co najmniej jednego użytkownika.")
+        if len(usernames) > MAX_ORDER_QUANTITY:
+            raise forms.ValidationError(f"Jedno zamówienie może zawierać najwyżej {MAX_ORDER_QUANTITY} karnetów.")
+
+        users = {user.username: user for user in User.objects.filter(username__in=usernames)}
+        missing = [name for name in usernames if name not in users]
+        if missing:
+            raise forms.ValidationError(f"Nie znaleziono użytkowników: {', '.join(missing[:20])}")
+        return [users[name] for name in usernames]
+
+class AuditLogFilterForm(forms.Form):
+    ACTION_CHOICES = [
+        ('', 'Wszystkie'),
+        ('visit.', 'Wizyty'),
+        ('class.', 'Zajęcia'),
+        ('order.', 'Zamówienia'),
+        ('admin.', 'Panel administracyjny'),
+    ]
+
+    actor = forms.CharField(
+        max_length=150,
+        required=False,
+        label="Pracownik (login)",
+        widget=forms.TextInput(attrs={'class': 'shadow border rounded w-full py-2 px-3'})
+    )
+    member = forms.CharField(
+        max_length=150,
+        required=False,
+        label="Członek (login)",
+        widget=forms.TextInput(attrs={'class': 'shadow border rounded w-full py-2 px-3'})
+    )
+    date_from = forms.DateField(
+        required=False,
+        label="Od",
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'shadow border rounded w-full py-2 px-3'})
+    )
+    date_to = forms.DateField(
+        required=False,
+        label="Do",
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'shadow border rounded w-full py-2 px-3'})
+    )
+    action = forms.ChoiceField(
+        choices=ACTION_CHOICES,
+        required=False,
+        label="Rodzaj",
+        widget=forms.Select(attrs={'class': 'shadow border rounded w-full py-2 px-3'})
+    )
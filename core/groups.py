@@ -0,0 +1,60 @@
+import random
+from datetime import timedelta
+
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import GroupPoolShard
+
+POOL_SHARDS = 4
+
+
+# Pula odnawia się w poniedziałek (czas lokalny klubu)
+def current_week_start():
+    today = timezone.localdate()
+    return today - timedelta(days=today.weekday())
+
+
+def create_pool(group, week_start):
+    shards = min(POOL_SHARDS, group.entries_per_week) or 1
+    base, extra = divmod(group.entries_per_week, shards)
+    # ignore_conflicts - dwa pierwsze wejścia tygodnia mogą tworzyć pulę równocześnie
+    GroupPoolShard.objects.bulk_create([
+        GroupPoolShard(group=group, week_start=week_start, shard=i, allotment=base + (1 if i < extra else 0))
+        for i in range(shards)
+    ], ignore_conflicts=True)
+
+
+def take_from_shards(group, week_start):
+    shards = list(range(POOL_SHARDS))
+    random.shuffle(shards)
+    for shard in shards:
+        # Warunkowy UPDATE jest atomowy - bez odczytu i bez SELECT FOR UPDATE
+        if GroupPoolShard.objects.filter(
+            group=group, week_start=week_start, shard=shard, used__lt=F('allotment')
+        ).update(used=F('used') + 1):
+            return True
+    return False
+
+
+# Wywoływać w transakcji razem z zapisem wizyty - wycofanie wizyty zwraca wejście do puli.
+# Zmiana wielkości puli obowiązuje od następnego tygodnia.
+def consume_entry(group, week_start):
+    if take_from_shards(group, week_start):
+        return True
+    if GroupPoolShard.objects.filter(group=group, week_start=week_start).exists():
+        return False
+    create_pool(group, week_start)
+    return take_from_shards(group, week_start)
+
+
+def pool_usage(group_ids, week_start):
+    rows = (
+        GroupPoolShard.objects.filter(group_id__in=group_ids, week_start=week_start)
+        .values('group_id').annotate(used=Sum('used'))
+    )
+    return {row['group_id']: row['used'] for row in rows}
+
+
+def remaining_entries(group, week_start):
+    return group.entries_per_week - pool_usage([group.id], week_start).get(group.id, 0)
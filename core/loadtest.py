@@ -0,0 +1,253 @@
+import json
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from http.cookiejar import CookieJar
+
+from django.contrib.auth.models import User
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import MembershipType, UserMembership, ClassSessions, Visit
+
+LOAD_PASSWORD = 'loadtest-haslo-123'
+MEMBER_PREFIX = 'load_member_'
+STAFF_PREFIX = 'load_staff_'
+
+# Poniedziałek 18:00: głównie wejścia/wyjścia na recepcji i fala zapisów na zajęcia
+DEFAULT_MIX = {
+    'toggle_visit': 45,
+    'signup_for_class': 20,
+    'signout_from_class': 5,
+    'dashboard': 15,
+    'class_schedule': 15,
+}
+
+LOCK_PATTERN = re.compile(rb'database is locked|deadlock detected|could not obtain lock|lock wait timeout', re.I)
+
+
+def parse_mix(value):
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in DEFAULT_MIX:
+            raise ValueError(f"Nieznana akcja: {name}")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+def seed_dataset(members, staff, classes, capacity):
+    membership_type, _ = MembershipType.objects.get_or_create(
+        name='Load test OPEN', defaults={'price': 0, 'duration_days': 30}
+    )
+    today = timezone.localdate()
+    for prefix, count, is_staff in ((MEMBER_PREFIX, members, False), (STAFF_PREFIX, staff, True)):
+        existing = set(User.objects.filter(username__startswith=prefix).values_list('username', flat=True))
+        for i in range(count):
+            username = f'{prefix}{i}'
+            if username in existing:
+                continue
+            user = User.objects.create_user(username, password=LOAD_PASSWORD, is_staff=is_staff)
+            if not is_staff:
+                UserMembership.objects.create(
+                    user=user, membership_type=membership_type,
+                    purchase_date=today, expiration_date=today + timedelta(days=30)
+                )
+
+    start = timezone.localtime().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    existing = ClassSessions.objects.filter(name__startswith='Load test', date__gte=timezone.now()).count()
+    for i in range(existing, classes):
+        ClassSessions.objects.create(
+            name=f'Load test {i}', date=start + timedelta(hours=2 * i), capacity=capacity, duration_minutes=60
+        )
+
+
+def check_invariants():
+    overbooked = ClassSessions.objects.annotate(enrolled=Count('enrollments')).filter(enrolled__gt=F('capacity'))
+    double_entry = (
+        Visit.objects.filter(exit_time__isnull=True).values('user_id')
+        .annotate(open_visits=Count('id')).filter(open_visits__gt=1)
+    )
+    return {
+        'overbooked_classes': overbooked.count(),
+        'double_entries': double_entry.count(),
+    }
+
+
+class Session:
+    def __init__(self, base_url, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.cookies = CookieJar()
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(self.cookies))
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None):
+        url = self.base_url + path
+        headers = {'Referer': url}
+        body = None
+        if data is not None:
+            data = {'csrfmiddlewaretoken': self.csrf_token(), **data}
+            body = urllib.parse.urlencode(data).encode()
+            headers['X-CSRFToken'] = self.csrf_token()
+        request = urllib.request.Request(url, data=body, headers=headers)
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    def login(self, username, password):
+        self.request('/login/')
+        status, body = self.request('/login/', {'username': username, 'password': password})
+        if b'name="password"' in body:
+            raise RuntimeError(f"Nie udało się zalogować jako {username}")
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, round(p / 100 * (len(sorted_values) - 1))))
+    return round(sorted_values[k] * 1000, 1)
+
+
+class LoadTest:
+    def __init__(self, base_url, requests, concurrency, mix=None, timeout=30, seed=None):
+        self.base_url = base_url
+        self.total_requests = requests
+        self.concurrency = concurrency
+        self.mix = mix or DEFAULT_MIX
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_errors = 0
+
+    def prepare(self):
+        self.member_ids = list(
+            User.objects.filter(username__startswith=MEMBER_PREFIX).order_by('id').values_list('id', flat=True)
+        )
+        self.class_ids = list(
+            ClassSessions.objects.filter(name__startswith='Load test', date__gte=timezone.now()).values_list('id', flat=True)
+        )
+        staff = list(User.objects.filter(username__startswith=STAFF_PREFIX).values_list('username', flat=True))
+        members = list(User.objects.filter(id__in=self.member_ids).values_list('username', flat=True))
+        if not staff or len(members) < self.concurrency or not self.class_ids:
+            raise RuntimeError("Brak danych testowych - uruchom z --seed lub zwiększ liczbę członków.")
+
+        # Każdy wątek ma własną sesję recepcji i własnego członka
+        self.workers = []
+        for i in range(self.concurrency):
+            desk = Session(self.base_url, self.timeout)
+            desk.login(staff[i % len(staff)], LOAD_PASSWORD)
+            member = Session(self.base_url, self.timeout)
+            member.login(members[i], LOAD_PASSWORD)
+            self.workers.append((desk, member))
+
+    def pick_action(self, rng):
+        actions = list(self.mix)
+        return rng.choices(actions, weights=[self.mix[a] for a in actions])[0]
+
+    def perform(self, desk, member, action, rng):
+        if action == 'toggle_visit':
+            return desk.request(f'/reception/toggle/{rng.choice(self.member_ids)}/', {})
+        if action == 'signup_for_class':
+            return member.request(f'/schedule/signup/{rng.choice(self.class_ids)}/')
+        if action == 'signout_from_class':
+            return member.request(f'/schedule/signout/{rng.choice(self.class_ids)}/', {})
+        if action == 'dashboard':
+            return member.request('/dashboard/')
+        return member.request('/schedule/')
+
+    def worker(self, index, count):
+        desk, member = self.workers[index]
+        rng = random.Random(self.random.random())
+        for _ in range(count):
+            action = self.pick_action(rng)
+            started = time.perf_counter()
+            try:
+                status, body = self.perform(desk, member, action, rng)
+            except OSError:
+                status, body = 599, b''
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                self.latencies[action].append(elapsed)
+                # Przekierowania są podążane, więc każda odpowiedź spoza 2xx (403 CSRF, 404, 5xx) to błąd
+                if not 200 <= status < 300:
+                    self.errors[action] += 1
+                # Komunikat o blokadzie może trafić też do strony po przekierowaniu (200); treść wyjątku
+                # w odpowiedzi 500 jest tylko przy DEBUG=True - inaczej blokady liczą się wyłącznie jako błędy
+                if LOCK_PATTERN.search(body):
+                    self.lock_errors += 1
+
+    def run(self):
+        self.prepare()
+        per_worker = [self.total_requests // self.concurrency] * self.concurrency
+        for i in range(self.total_requests % self.concurrency):
+            per_worker[i] += 1
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            list(pool.map(self.worker, range(self.concurrency), per_worker))
+        duration = time.perf_counter() - started
+        return self.summary(duration)
+
+    def summary(self, duration):
+        actions = {}
+        all_latencies = []
+        for action, values in sorted(self.latencies.items()):
+            values.sort()
+            all_latencies.extend(values)
+            actions[action] = {
+                'count': len(values),
+                'errors': self.errors[action],
+                'p50_ms': percentile(values, 50),
+                'p95_ms': percentile(values, 95),
+                'p99_ms': percentile(values, 99),
+            }
+        all_latencies.sort()
+        return {
+            'started_at': timezone.now().isoformat(),
+            'config': {
+                'base_url': self.base_url,
+                'requests': self.total_requests,
+                'concurrency': self.concurrency,
+                'mix': self.mix,
+            },
+            'duration_s': round(duration, 2),
+            'throughput_rps': round(len(all_latencies) / duration, 1) if duration else None,
+            'p50_ms': percentile(all_latencies, 50),
+            'p95_ms': percentile(all_latencies, 95),
+            'p99_ms': percentile(all_latencies, 99),
+            'errors': sum(self.errors.values()),
+            'lock_errors': self.lock_errors,
+            'actions': actions,
+            'invariants': check_invariants(),
+        }
+
+
+def compare(previous, current):
+    rows = []
+    for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'errors', 'lock_errors'):
+        rows.append((key, previous.get(key), current.get(key)))
+    for key in ('overbooked_classes', 'double_entries'):
+        rows.append((key, previous['invariants'].get(key), current['invariants'].get(key)))
+    return rows
+
+
+def save_results(results, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(results, indent=2), encoding='utf-8')
@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+# Kod wykonywany w świeżym procesie - te same kroki co przy starcie workera
+# (ustawienia, aplikacje, urlconf z widokami, biblioteki tagów szablonów)
+WORKER_SCRIPT = """
+import json, resource, sys, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+from django.template import engines
+engines['django'].engine
+print(json.dumps({
+    'startup_ms': (time.perf_counter() - start) * 1000,
+    'rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'modules': sorted(sys.modules),
+}))
+"""
+
+# Biblioteki, które mają się ładować dopiero przy pierwszym użyciu
+LAZY_MODULES = ('numpy', 'PIL', 'qrcode')
+# Aplikacje deweloperskie - nie mogą się ładować przy DEBUG = False
+DEV_MODULES = ('tailwind', 'theme', 'django_browser_reload')
+
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+\d+ \|\s+(\S+)')
+
+
+class Command(BaseCommand):
+    help = ("Mierzy czas startu i pamięć (RSS) workera w osobnych procesach dla bieżących ustawień "
+            "(--settings) i zgłasza regresje względem pliku bazowego.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=5, help="Liczba mierzonych procesów")
+        parser.add_argument('--top', type=int, default=10, help="Ile najcięższych pakietów pokazać")
+        parser.add_argument('--output', default=None, help="Plik JSON z wynikami (domyślnie var/bench_startup/)")
+        parser.add_argument('--baseline', default=None, help="Poprzedni plik z wynikami do porównania")
+        parser.add_argument('--tolerance', type=float, default=0.15,
+                            help="Dopuszczalny wzrost czasu, pamięci i liczby modułów (0.15 = 15%%)")
+
+    def handle(self, *args, **options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'GymManager.settings')}
+        runs = [self.run_worker(env) for _ in range(options['workers'])]
+        modules = set(runs[0]['modules'])
+
+        results = {
+            'settings': env['DJANGO_SETTINGS_MODULE'],
+            'python': sys.version.split()[0],
+            'workers': len(runs),
+            'startup_ms': round(statistics.median(run['startup_ms'] for run in runs), 1),
+            'startup_ms_max': round(max(run['startup_ms'] for run in runs), 1),
+            'rss_mb': round(statistics.median(run['rss_kb'] for run in runs) / 1024, 1),
+            'modules': len(modules),
+            'lazy_modules_loaded': [name for name in LAZY_MODULES if name in modules],
+            'dev_modules_loaded': [name for name in DEV_MODULES if name in modules],
+            'top_imports_ms': self.profile_imports(env, options['top']),
+        }
+
+        self.stdout.write(f"Ustawienia: {results['settings']} (Python {results['python']}, {results['workers']} procesów)")
+        self.stdout.write(f"  start: mediana {results['startup_ms']} ms, max {results['startup_ms_max']} ms")
+        self.stdout.write(f"  pamięć: {results['rss_mb']} MB RSS, {results['modules']} modułów")
+        self.stdout.write("  najcięższe pakiety (czas importu):")
+        for package, ms in results['top_imports_ms']:
+            self.stdout.write(f"    {package:30} {ms:8.1f} ms")
+
+        output = Path(options['output'] or settings.BASE_DIR / 'var' / 'bench_startup'
+                      / f"{timezone.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+        self.stdout.write(f"Wyniki zapisano w {output}")
+
+        regressions = self.find_regressions(results, options['baseline'], options['tolerance'])
+        if regressions:
+            for message in regressions:
+                self.stderr.write(self.style.ERROR(f"  {message}"))
+            raise CommandError(f"Wykryto regresje startu workera: {len(regressions)}")
+        self.stdout.write(self.style.SUCCESS("Brak regresji."))
+
+    def run_worker(self, env):
+        completed = subprocess.run([sys.executable, '-c', WORKER_SCRIPT], env=env, cwd=settings.BASE_DIR,
+                                   capture_output=True, text=True)
+        if completed.returncode:
+            raise CommandError(f"Proces testowy zakończył się błędem:\n{completed.stderr}")
+        return json.loads(completed.stdout.strip().splitlines()[-1])
+
+    def profile_imports(self, env, top):
+        # Osobny przebieg z -X importtime - narzut profilowania nie psuje pomiarów powyżej
+        completed = subprocess.run([sys.executable, '-X', 'importtime', '-c', WORKER_SCRIPT], env=env,
+                                   cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self_time = defaultdict(int)
+        for match in IMPORTTIME_LINE.finditer(completed.stderr):
+            self_time[match.group(2).strip().split('.')[0]] += int(match.group(1))
+        heaviest = sorted(self_time.items(), key=lambda item: item[1], reverse=True)[:top]
+        return [[package, round(us / 1000, 1)] for package, us in heaviest]
+
+    def find_regressions(self, results, baseline_path, tolerance):
+        regressions = [f"{name} ładuje się przy starcie - importuj go dopiero w miejscu użycia"
+                       for name in results['lazy_modules_loaded']]
+        if not settings.DEBUG:
+            regressions += [f"aplikacja deweloperska {name} ładuje się przy DEBUG = False"
+                            for name in results['dev_modules_loaded']]
+
+        if baseline_path:
+            baseline = json.loads(Path(baseline_path).read_text(encoding='utf-8'))
+            self.stdout.write(f"Porównanie z {baseline_path} (poprzednio -> teraz):")
+            for key in ('startup_ms', 'rss_mb', 'modules'):
+                before, after = baseline[key], results[key]
+                self.stdout.write(f"  {key:12} {before} -> {after}")
+                if after > before * (1 + tolerance):
+                    regressions.append(f"{key} wzrosło z {before} do {after} (tolerancja {tolerance:.0%})")
+        return regressions
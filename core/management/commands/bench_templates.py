@@ -0,0 +1,132 @@
+import secrets
+import statistics
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+
+from core.models import MembershipType, UserMembership, ClassSessions, Enrollments, Profile, Visit
+from core.views import class_schedule, reception_panel
+
+DUMMY_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+LOCMEM_BACKEND = 'django.core.cache.backends.locmem.LocMemCache'
+REDIS_BACKEND = 'django.core.cache.backends.redis.RedisCache'
+
+
+# Osobny, pusty cache na czas pomiaru - nie czyścimy cache aplikacji (znaczniki wersji, dane produkcyjne).
+# Backend sieciowy (np. Redis z settings_production) dostaje własny KEY_PREFIX, sprzątany po pomiarze
+def bench_caches(cache_url=None):
+    configs = [('locmem', {
+        'BACKEND': LOCMEM_BACKEND,
+        'LOCATION': f'bench-templates-{secrets.token_hex(4)}',
+        'OPTIONS': {'MAX_ENTRIES': 100_000},
+    })]
+    if cache_url:
+        configured = {'BACKEND': REDIS_BACKEND, 'LOCATION': cache_url}
+    else:
+        configured = dict(settings.CACHES['default'])
+    if configured['BACKEND'] != LOCMEM_BACKEND:
+        configured['KEY_PREFIX'] = f'bench-templates-{secrets.token_hex(4)}'
+        configs.append((configured['BACKEND'].rsplit('.', 1)[-1], configured))
+    return configs
+
+
+def purge_bench_keys(config):
+    if config['BACKEND'] != REDIS_BACKEND:
+        return
+    client = caches['default']._cache.get_client(write=True)
+    for key in client.scan_iter(match=f"{config['KEY_PREFIX']}:*"):
+        client.delete(key)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ("Mierzy czas renderowania panelu recepcji i grafiku zajęć bez cache fragmentów "
+            "oraz z pustym i rozgrzanym cache. Dane testowe są wycofywane po pomiarze.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--members', type=int, default=5000)
+        parser.add_argument('--classes', type=int, default=50)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--cache-url', default=None,
+                            help="Redis do pomiaru (np. redis://127.0.0.1:6379/1); domyślnie backend z settings.CACHES")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                staff = self.seed(options['members'], options['classes'])
+                self.run(staff, options['repeat'], bench_caches(options['cache_url']))
+                raise Rollback
+        except Rollback:
+            pass
+
+    def seed(self, members, classes):
+        suffix = secrets.token_hex(4)
+        staff = User.objects.create_user(f'bench_staff_{suffix}', is_staff=True)
+        membership_type = MembershipType.objects.create(
+            name='Benchmark', price=0, duration_days=30, entries_per_week=3
+        )
+        users = User.objects.bulk_create(
+            User(username=f'bench_{suffix}_{i}', first_name='Jan', last_name=f'Nowak{i}') for i in range(members)
+        )
+        users = list(User.objects.filter(username__startswith=f'bench_{suffix}_'))
+        Profile.objects.bulk_create(Profile(user=user, card_number=secrets.token_hex(32)) for user in users)
+        today = timezone.localdate()
+        UserMembership.objects.bulk_create(
+            UserMembership(user=user, membership_type=membership_type, purchase_date=today,
+                           expiration_date=today + timedelta(days=30))
+            for user in users[::2]
+        )
+        Visit.objects.bulk_create(Visit(user=user) for user in users[::3])
+
+        start = timezone.now() + timedelta(days=1)
+        sessions = ClassSessions.objects.bulk_create(
+            ClassSessions(name=f'Bench {i}', date=start + timedelta(hours=i), end_date=start + timedelta(hours=i, minutes=60),
+                          duration_minutes=60, capacity=30)
+            for i in range(classes)
+        )
+        sessions = list(ClassSessions.objects.filter(name__startswith='Bench ', date__gte=start))
+        Enrollments.objects.bulk_create(
+            Enrollments(user=user, class_session=session, starts_at=session.date, ends_at=session.end_date)
+            for session in sessions for user in users[:20]
+        )
+        return staff
+
+    def measure(self, view, path, user, repeat):
+        factory = RequestFactory()
+        timings = []
+        for _ in range(repeat):
+            request = factory.get(path)
+            request.user = user
+            started = time.perf_counter()
+            view(request).content
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def run(self, staff, repeat, configs):
+        # Panel recepcji robi jedno GET do cache na wiersz - przy Redisie liczą się round-tripy,
+        # więc wynik dla LocMemCache nie mówi nic o konfiguracji produkcyjnej
+        pages = [('reception_panel', reception_panel, '/reception/'), ('class_schedule', class_schedule, '/schedule/')]
+        self.stdout.write(f"{'strona':20} {'cache':14} {'bez cache':>12} {'pusty cache':>12} {'rozgrzany':>12}")
+        for name, view, path in pages:
+            with override_settings(CACHES=DUMMY_CACHE):
+                without_cache = self.measure(view, path, staff, repeat)
+            for label, config in configs:
+                with override_settings(CACHES={'default': config}):
+                    try:
+                        cold = self.measure(view, path, staff, 1)
+                        warm = self.measure(view, path, staff, repeat)
+                    finally:
+                        purge_bench_keys(config)
+                self.stdout.write(f"{name:20} {label:14} {without_cache:10.1f}ms {cold:10.1f}ms {warm:10.1f}ms")
@@ -0,0 +1,39 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from core.outbox import DispatchError, dispatch_batch, get_sinks, purge_sent
+
+
+class Command(BaseCommand):
+    help = "Wysyła zdarzenia z outboxa do skonfigurowanych odbiorców (settings.OUTBOX_SINKS)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--interval', type=float, default=1.0, help="Przerwa (s), gdy outbox jest pusty")
+        parser.add_argument('--once', action='store_true', help="Opróżnij outbox i zakończ")
+        parser.add_argument('--purge-days', type=int, default=7, help="Usuń wysłane zdarzenia starsze niż N dni")
+
+    def handle(self, *args, **options):
+        sinks = get_sinks()
+        if not sinks:
+            self.stderr.write("Brak odbiorców w settings.OUTBOX_SINKS - zdarzenia pozostaną w kolejce.")
+            return
+
+        purged = purge_sent(timedelta(days=options['purge_days']))
+        if purged:
+            self.stdout.write(f"Usunięto {purged} wysłanych zdarzeń.")
+
+        while True:
+            try:
+                sent = dispatch_batch(sinks, batch_size=options['batch_size'])
+            except DispatchError as e:
+                self.stderr.write(f"Błąd wysyłki, ponowienie później: {e}")
+                sent = 0
+            if sent:
+                self.stdout.write(f"Wysłano {sent} zdarzeń.")
+                continue
+            if options['once']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core.loadtest import DEFAULT_MIX, LoadTest, compare, parse_mix, save_results, seed_dataset
+
+
+class Command(BaseCommand):
+    help = ("Odtwarza szczyt ruchu (np. poniedziałek 18:00) na działającym serwerze "
+            "(runserver/gunicorn/uvicorn) i zapisuje wyniki do porównań. Blokady bazy w odpowiedziach 500 "
+            "są rozpoznawane tylko przy DEBUG=True na serwerze.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help="Adres serwera")
+        parser.add_argument('--requests', type=int, default=1500)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--mix', default=None,
+                            help="Wagi akcji, np. " + ','.join(f'{k}={v}' for k, v in DEFAULT_MIX.items()))
+        parser.add_argument('--seed', action='store_true', help="Utwórz konta, karnety i zajęcia testowe")
+        parser.add_argument('--members', type=int, default=300)
+        parser.add_argument('--staff', type=int, default=3)
+        parser.add_argument('--classes', type=int, default=10)
+        parser.add_argument('--capacity', type=int, default=20)
+        parser.add_argument('--random-seed', type=int, default=None)
+        parser.add_argument('--output', default=None, help="Plik JSON z wynikami (domyślnie var/loadtest/)")
+        parser.add_argument('--compare', default=None, help="Poprzedni plik z wynikami do porównania")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options['mix']) if options['mix'] else None
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['seed']:
+            seed_dataset(options['members'], options['staff'], options['classes'], options['capacity'])
+            self.stdout.write("Dane testowe gotowe.")
+
+        test = LoadTest(options['url'], options['requests'], options['concurrency'], mix=mix,
+                        seed=options['random_seed'])
+        try:
+            results = test.run()
+        except RuntimeError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(f"Czas: {results['duration_s']} s, przepustowość: {results['throughput_rps']} req/s")
+        self.stdout.write(f"Opóźnienie p50/p95/p99: {results['p50_ms']} / {results['p95_ms']} / {results['p99_ms']} ms")
+        for action, stats in results['actions'].items():
+            self.stdout.write(f"  {action:20} n={stats['count']:5} błędy={stats['errors']:3} "
+                              f"p50={stats['p50_ms']} p95={stats['p95_ms']} p99={stats['p99_ms']} ms")
+        self.stdout.write(f"Błędy: {results['errors']} (blokady bazy: {results['lock_errors']})")
+
+        invariants = results['invariants']
+        style = self.style.ERROR if any(invariants.values()) else self.style.SUCCESS
+        self.stdout.write(style(f"Przepełnione zajęcia: {invariants['overbooked_classes']}, "
+                                f"podwójne wejścia: {invariants['double_entries']}"))
+
+        output = Path(options['output'] or settings.BASE_DIR / 'var' / 'loadtest'
+                      / f"{timezone.now():%Y%m%d-%H%M%S}.json")
+        save_results(results, output)
+        self.stdout.write(f"Wyniki zapisano w {output}")
+
+        if options['compare']:
+            previous = json.loads(Path(options['compare']).read_text(encoding='utf-8'))
+            self.stdout.write("Porównanie (poprzednio -> teraz):")
+            for key, before, after in compare(previous, results):
+                self.stdout.write(f"  {key:20} {before} -> {after}")
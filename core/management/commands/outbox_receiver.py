@@ -0,0 +1,39 @@
+import json
+import random
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = "Lokalny odbiornik HTTP udający system zewnętrzny - wypisuje otrzymane zdarzenia outboxa."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--fail-rate', type=float, default=0.0, help="Odsetek żądań kończonych błędem 503 (test ponowień)")
+
+    def handle(self, *args, **options):
+        stdout = self.stdout
+        fail_rate = options['fail_rate']
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if random.random() < fail_rate:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+                for event in json.loads(body).get('events', []):
+                    stdout.write(f"#{event['id']} {event['type']} {event['object_id']}")
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(('127.0.0.1', options['port']), Handler)
+        self.stdout.write(f"Nasłuchuję na http://127.0.0.1:{options['port']}/")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.server_close()
@@ -0,0 +1,48 @@
+import re
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import FileField
+
+from core.storage import ContentAddressedMixin
+
+HASHED_NAME = re.compile(r'(^|/)[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}(\.[^/]*)?$')
+
+
+class Command(BaseCommand):
+    help = ("Przenosi pliki zapisane przed wprowadzeniem core.storage (nazwy z sufiksami, np. foto_QvjcvEF.jpg) "
+            "do układu po skrócie treści, łącząc duplikaty w jeden plik.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--delete-old', action='store_true', help="Usuń stare pliki po przeniesieniu")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        moved = deleted = 0
+        for model in apps.get_models():
+            for field in model._meta.concrete_fields:
+                if not isinstance(field, FileField) or not isinstance(field.storage, ContentAddressedMixin):
+                    continue
+                storage = field.storage
+                rows = (
+                    model._default_manager.exclude(**{field.name: ''})
+                    .values_list('pk', field.attname).order_by('pk').iterator()
+                )
+                for pk, old_name in rows:
+                    if HASHED_NAME.search(old_name) or not storage.exists(old_name):
+                        continue
+                    if options['dry_run']:
+                        self.stdout.write(f"{model.__name__}.{field.name} #{pk}: {old_name}")
+                        moved += 1
+                        continue
+                    with storage.open(old_name, 'rb') as f:
+                        new_name = storage.save(old_name, f)
+                    model._default_manager.filter(pk=pk).update(**{field.attname: new_name})
+                    moved += 1
+                    self.stdout.write(f"{model.__name__}.{field.name} #{pk}: {old_name} -> {new_name}")
+                    if options['delete_old'] and not model._default_manager.filter(**{field.attname: old_name}).exists():
+                        storage.delete(old_name)
+                        deleted += 1
+
+        verb = "Do przeniesienia" if options['dry_run'] else "Przeniesiono"
+        self.stdout.write(self.style.SUCCESS(f"{verb}: {moved} plików, usunięto starych: {deleted}."))
@@ -0,0 +1,27 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from core.orders import render_pending_receipts
+
+
+class Command(BaseCommand):
+    help = "Generuje w tle paragony (HTML) dla nowych zamówień karnetów."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Liczba wątków generujących paragony")
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--interval', type=float, default=2.0, help="Przerwa (s), gdy kolejka jest pusta")
+        parser.add_argument('--once', action='store_true', help="Opróżnij kolejkę i zakończ")
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            while True:
+                rendered, claimed = render_pending_receipts(executor, batch_size=options['batch_size'])
+                if claimed:
+                    self.stdout.write(f"Wygenerowano {rendered}/{claimed} paragonów.")
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
@@ -0,0 +1,38 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.onboarding import validate_pesel_batch
+
+
+class Command(BaseCommand):
+    help = "Sprawdza kolumnę PESEL w pliku CSV przed importem członków (bez zapisu do bazy)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Plik CSV z nagłówkiem")
+        parser.add_argument('--column', default='pesel', help="Nazwa kolumny z numerem PESEL")
+        parser.add_argument('--delimiter', default=',')
+        parser.add_argument('--skip-database', action='store_true', help="Nie sprawdzaj duplikatów w bazie")
+
+    def handle(self, *args, **options):
+        with open(options['path'], newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f, delimiter=options['delimiter'])
+            if options['column'] not in (reader.fieldnames or []):
+                raise CommandError(f"Brak kolumny '{options['column']}' w pliku.")
+            values = [row[options['column']] for row in reader]
+
+        report = validate_pesel_batch(values, check_database=not options['skip_database'])
+        for row in report['rows']:
+            if row['errors']:
+                message = '; '.join(row['errors'])
+                if row['duplicate_of'] is not None:
+                    message += f" (pierwsze wystąpienie: wiersz {self.line_number(row['duplicate_of'])})"
+                self.stdout.write(f"Wiersz {self.line_number(row['index'])} ({row['pesel']}): {message}")
+
+        if not report['is_valid']:
+            raise CommandError(f"Znaleziono błędy w {report['error_count']} z {len(report['rows'])} wierszy.")
+        self.stdout.write(self.style.SUCCESS(f"Wszystkie {len(report['rows'])} numery PESEL są poprawne."))
+
+    def line_number(self, index):
+        # +2: nagłówek i numeracja wierszy od 1
+        return index + 2
@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 11:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_membershiptype_entries_per_week'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='classsessions',
+            name='date',
+            field=models.DateTimeField(db_index=True, verbose_name='Data zajęć'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['-entry_time'], name='visit_entry_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='visit',
+            index=models.Index(fields=['user', '-entry_time'], name='visit_user_entry_idx'),
+        ),
+    ]
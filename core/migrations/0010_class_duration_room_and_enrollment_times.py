@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-19 12:10
+
+from datetime import timedelta
+
+import django.core.validators
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_class_times(apps, schema_editor):
+    ClassSessions = apps.get_model('core', 'ClassSessions')
+    Enrollments = apps.get_model('core', 'Enrollments')
+    for session in ClassSessions.objects.all():
+        session.end_date = session.date + timedelta(minutes=session.duration_minutes)
+        session.save(update_fields=['end_date'])
+        Enrollments.objects.filter(class_session=session).update(starts_at=session.date, ends_at=session.end_date)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_visit_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='membershiptype',
+            name='classes_per_day',
+            field=models.PositiveIntegerField(blank=True, help_text='Zostaw puste dla karnetu bez limitu zajęć', null=True, verbose_name='Limit zajęć dziennie'),
+        ),
+        migrations.AddField(
+            model_name='classsessions',
+            name='duration_minutes',
+            field=models.PositiveIntegerField(default=60, validators=[django.core.validators.MinValueValidator(1), django.core.validators.MaxValueValidator(240)], verbose_name='Czas trwania (min)'),
+        ),
+        migrations.AddField(
+            model_name='classsessions',
+            name='room',
+            field=models.CharField(blank=True, default='', max_length=50, verbose_name='Sala'),
+        ),
+        migrations.AddField(
+            model_name='classsessions',
+            name='end_date',
+            field=models.DateTimeField(editable=False, null=True, verbose_name='Koniec zajęć'),
+        ),
+        migrations.AddField(
+            model_name='enrollments',
+            name='starts_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='enrollments',
+            name='ends_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_class_times, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='classsessions',
+            name='end_date',
+            field=models.DateTimeField(editable=False, verbose_name='Koniec zajęć'),
+        ),
+        migrations.AlterField(
+            model_name='enrollments',
+            name='starts_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AlterField(
+            model_name='enrollments',
+            name='ends_at',
+            field=models.DateTimeField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='classsessions',
+            index=models.Index(fields=['room', 'date'], name='class_room_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='enrollments',
+            index=models.Index(fields=['user', 'starts_at'], name='enrollment_user_start_idx'),
+        ),
+    ]
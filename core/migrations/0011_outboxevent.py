@@ -0,0 +1,35 @@
+# Generated by Django 6.0 on 2026-10-19 11:37
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_class_duration_room_and_enrollment_times'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(max_length=64, verbose_name='Typ zdarzenia')),
+                ('object_id', models.CharField(max_length=64, verbose_name='ID obiektu')),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dane')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Utworzono')),
+                ('status', models.CharField(choices=[('pending', 'Oczekuje'), ('sent', 'Wysłane'), ('failed', 'Błąd')], default='pending', max_length=10, verbose_name='Status')),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Następna próba')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Liczba prób')),
+                ('last_error', models.TextField(blank=True, default='', verbose_name='Ostatni błąd')),
+                ('sent_at', models.DateTimeField(blank=True, null=True, verbose_name='Wysłano')),
+            ],
+            options={
+                'verbose_name': 'Zdarzenie (outbox)',
+                'verbose_name_plural': 'Zdarzenia (outbox)',
+                'indexes': [models.Index(fields=['status', 'available_at'], name='outbox_pending_idx')],
+            },
+        ),
+    ]
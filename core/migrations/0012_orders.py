@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-19 11:48
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_membership_prices(apps, schema_editor):
+    # Dotychczasowe karnety dostają bieżącą cenę cennika - historii cen nie było
+    MembershipType = apps.get_model('core', 'MembershipType')
+    UserMembership = apps.get_model('core', 'UserMembership')
+    UserMembership.objects.filter(price__isnull=True, membership_type__isnull=False).update(
+        price=Subquery(MembershipType.objects.filter(id=OuterRef('membership_type_id')).values('price')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_outboxevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usermembership',
+            name='price',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True, verbose_name='Cena zakupu'),
+        ),
+        migrations.RunPython(fill_membership_prices, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='Order',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('idempotency_key', models.CharField(max_length=64, verbose_name='Klucz idempotencji')),
+                ('membership_name', models.CharField(max_length=100, verbose_name='Nazwa karnetu')),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=6, verbose_name='Cena jednostkowa')),
+                ('duration_days', models.PositiveIntegerField(verbose_name='Długość (dni)')),
+                ('quantity', models.PositiveIntegerField(default=1, verbose_name='Liczba karnetów')),
+                ('total_price', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Wartość')),
+                ('company_name', models.CharField(blank=True, default='', max_length=200, verbose_name='Firma')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Utworzono')),
+                ('receipt_status', models.CharField(choices=[('pending', 'Oczekuje'), ('rendering', 'W przygotowaniu'), ('ready', 'Gotowy'), ('failed', 'Błąd')], default='pending', max_length=10, verbose_name='Status paragonu')),
+                ('receipt', models.FileField(blank=True, upload_to='receipts/', verbose_name='Paragon')),
+                ('receipt_attempts', models.PositiveIntegerField(default=0, verbose_name='Próby generowania')),
+                ('receipt_claimed_at', models.DateTimeField(blank=True, null=True, verbose_name='Pobrano do generowania')),
+                ('receipt_error', models.TextField(blank=True, default='', verbose_name='Ostatni błąd')),
+                ('buyer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='orders', to=settings.AUTH_USER_MODEL, verbose_name='Kupujący')),
+                ('membership_type', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.membershiptype', verbose_name='Rodzaj karnetu')),
+            ],
+            options={
+                'verbose_name': 'Zamówienie',
+                'verbose_name_plural': 'Zamówienia',
+            },
+        ),
+        migrations.AddField(
+            model_name='usermembership',
+            name='order',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='memberships', to='core.order', verbose_name='Zamówienie'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['receipt_status', 'receipt_claimed_at'], name='order_receipt_queue_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(fields=('buyer', 'idempotency_key'), name='order_idempotency_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 6.0 on 2026-10-19 11:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_orders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GroupAccount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Nazwa')),
+                ('kind', models.CharField(choices=[('family', 'Rodzinne'), ('corporate', 'Firmowe')], default='corporate', max_length=10, verbose_name='Rodzaj')),
+                ('entries_per_week', models.PositiveIntegerField(verbose_name='Pula wejść w tygodniu')),
+            ],
+            options={
+                'verbose_name': 'Konto grupowe',
+                'verbose_name_plural': 'Konta grupowe',
+            },
+        ),
+        migrations.AddField(
+            model_name='usermembership',
+            name='group',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='memberships', to='core.groupaccount', verbose_name='Konto grupowe'),
+        ),
+        migrations.CreateModel(
+            name='GroupPoolShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_start', models.DateField(verbose_name='Początek tygodnia')),
+                ('shard', models.PositiveSmallIntegerField(verbose_name='Część puli')),
+                ('allotment', models.PositiveIntegerField(verbose_name='Przydział wejść')),
+                ('used', models.PositiveIntegerField(default=0, verbose_name='Wykorzystane')),
+                ('group', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pool_shards', to='core.groupaccount')),
+            ],
+            options={
+                'verbose_name': 'Część puli wejść',
+                'verbose_name_plural': 'Części puli wejść',
+                'constraints': [models.UniqueConstraint(fields=('group', 'week_start', 'shard'), name='group_pool_shard_uniq')],
+            },
+        ),
+    ]
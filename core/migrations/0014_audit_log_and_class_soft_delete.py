@@ -0,0 +1,42 @@
+# Generated by Django 6.0 on 2026-10-19 11:58
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_group_accounts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='classsessions',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Usunięto'),
+        ),
+        migrations.CreateModel(
+            name='AuditLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Czas')),
+                ('actor_name', models.CharField(max_length=150, verbose_name='Login wykonującego')),
+                ('action', models.CharField(max_length=50, verbose_name='Akcja')),
+                ('object_type', models.CharField(blank=True, default='', max_length=50, verbose_name='Typ obiektu')),
+                ('object_id', models.CharField(blank=True, default='', max_length=64, verbose_name='ID obiektu')),
+                ('details', models.JSONField(blank=True, default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Szczegóły')),
+                ('actor', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Wykonał')),
+                ('member', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Członek')),
+            ],
+            options={
+                'verbose_name': 'Wpis dziennika',
+                'verbose_name_plural': 'Dziennik działań',
+                'indexes': [models.Index(fields=['-created_at'], name='audit_created_idx'), models.Index(fields=['actor', '-created_at'], name='audit_actor_idx'), models.Index(fields=['member', '-created_at'], name='audit_member_idx')],
+            },
+        ),
+    ]
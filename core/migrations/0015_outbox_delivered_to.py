@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_audit_log_and_class_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxevent',
+            name='delivered_to',
+            field=models.JSONField(blank=True, default=list, verbose_name='Dostarczono do'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-19 12:09
+
+import core.models
+from django.db import migrations, models
+
+
+def requeue_receipts(apps, schema_editor):
+    # Paragony z publicznego MEDIA_ROOT/receipts generujemy ponownie w niepublicznym magazynie
+    # (render_receipts); stare pliki można potem usunąć z media/receipts
+    Order = apps.get_model('core', 'Order')
+    Order.objects.exclude(receipt='').update(receipt='', receipt_status='pending', receipt_attempts=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_outbox_delivered_to'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='order',
+            name='receipt',
+            field=models.FileField(blank=True, storage=core.models.receipt_storage, upload_to='receipts/', verbose_name='Paragon'),
+        ),
+        migrations.RunPython(requeue_receipts, migrations.RunPython.noop),
+    ]
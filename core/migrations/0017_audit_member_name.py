@@ -0,0 +1,28 @@
+# Generated by Django 6.0 on 2026-10-19 12:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def fill_member_names(apps, schema_editor):
+    AuditLog = apps.get_model('core', 'AuditLog')
+    User = apps.get_model('auth', 'User')
+    AuditLog.objects.filter(member__isnull=False).update(
+        member_name=Subquery(User.objects.filter(id=OuterRef('member_id')).values('username')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_private_receipt_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='auditlog',
+            name='member_name',
+            field=models.CharField(blank=True, default='', max_length=150, verbose_name='Login członka'),
+        ),
+        migrations.RunPython(fill_member_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-19 12:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_audit_member_name'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='classsessions',
+            constraint=models.CheckConstraint(condition=models.Q(('duration_minutes__gte', 1), ('duration_minutes__lte', 240)), name='class_duration_range', violation_error_message='Zajęcia mogą trwać od 1 do 240 minut.'),
+        ),
+    ]
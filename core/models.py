@@ -1,13 +1,17 @@
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 
-from django.db import models
+from django.db import models, transaction
+from django.core.files.storage import storages
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 import secrets
 from .validators import validate_pesel
+from .versions import bump_version_on_commit
 
 # Rodzaje karnetu (nazwa, cena, czas trwania, ilość wejść)
 class MembershipType(models.Model):
@@ -22,10 +26,105 @@ class MembershipType(models.Model):
         blank=True,
         help_text="Zostaw puste dla karnetu bez limitu (Open)"
     )
+    classes_per_day = models.PositiveIntegerField(
+        verbose_name="Limit zajęć dziennie",
+        null=True,
+        blank=True,
+        help_text="Zostaw puste dla karnetu bez limitu zajęć"
+    )
     def __str__(self):
         limit_str = f"{self.entries_per_week} wejść/tydzień" if self.entries_per_week else "OPEN"
         return f"{self.name} ({limit_str})"
 
+# Paragony leżą poza MEDIA_ROOT (settings.STORAGES['receipts']) - pobiera się je wyłącznie
+# przez widok order_receipt, który sprawdza właściciela zamówienia
+def receipt_storage():
+    return storages['receipts']
+
+
+# Zamówienie karnetów (pojedyncze lub firmowe) z migawką ceny z chwili zakupu.
+# Klucz idempotencji sprawia, że podwójne kliknięcie albo ponowiony request
+# zwraca istniejące zamówienie zamiast kupować karnet drugi raz
+class Order(models.Model):
+    RECEIPT_PENDING = 'pending'
+    RECEIPT_RENDERING = 'rendering'
+    RECEIPT_READY = 'ready'
+    RECEIPT_FAILED = 'failed'
+    RECEIPT_STATUS_CHOICES = [
+        (RECEIPT_PENDING, 'Oczekuje'),
+        (RECEIPT_RENDERING, 'W przygotowaniu'),
+        (RECEIPT_READY, 'Gotowy'),
+        (RECEIPT_FAILED, 'Błąd'),
+    ]
+
+    buyer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='orders', verbose_name="Kupujący")
+    idempotency_key = models.CharField(max_length=64, verbose_name="Klucz idempotencji")
+    membership_type = models.ForeignKey(MembershipType, on_delete=models.SET_NULL, null=True, verbose_name="Rodzaj karnetu")
+    membership_name = models.CharField(max_length=100, verbose_name="Nazwa karnetu")
+    unit_price = models.DecimalField(max_digits=6, decimal_places=2, verbose_name="Cena jednostkowa")
+    duration_days = models.PositiveIntegerField(verbose_name="Długość (dni)")
+    quantity = models.PositiveIntegerField(default=1, verbose_name="Liczba karnetów")
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Wartość")
+    company_name = models.CharField(max_length=200, blank=True, default="", verbose_name="Firma")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Utworzono")
+
+    # Paragon generuje w tle komenda render_receipts
+    receipt_status = models.CharField(max_length=10, choices=RECEIPT_STATUS_CHOICES, default=RECEIPT_PENDING,
+                                      verbose_name="Status paragonu")
+    receipt = models.FileField(upload_to='receipts/', storage=receipt_storage, blank=True, verbose_name="Paragon")
+    receipt_attempts = models.PositiveIntegerField(default=0, verbose_name="Próby generowania")
+    receipt_claimed_at = models.DateTimeField(null=True, blank=True, verbose_name="Pobrano do generowania")
+    receipt_error = models.TextField(blank=True, default="", verbose_name="Ostatni błąd")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['buyer', 'idempotency_key'], name='order_idempotency_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['receipt_status', 'receipt_claimed_at'], name='order_receipt_queue_idx'),
+        ]
+        verbose_name = "Zamówienie"
+        verbose_name_plural = "Zamówienia"
+
+    def __str__(self):
+        return f"Zamówienie #{self.pk} - {self.membership_name} x{self.quantity}"
+
+# Konto grupowe (rodzina, firma) ze wspólną tygodniową pulą wejść dla wszystkich członków
+class GroupAccount(models.Model):
+    FAMILY = 'family'
+    CORPORATE = 'corporate'
+    KIND_CHOICES = [
+        (FAMILY, 'Rodzinne'),
+        (CORPORATE, 'Firmowe'),
+    ]
+
+    name = models.CharField(max_length=200, verbose_name="Nazwa")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, default=CORPORATE, verbose_name="Rodzaj")
+    entries_per_week = models.PositiveIntegerField(verbose_name="Pula wejść w tygodniu")
+
+    class Meta:
+        verbose_name = "Konto grupowe"
+        verbose_name_plural = "Konta grupowe"
+
+    def __str__(self):
+        return f"{self.name} ({self.entries_per_week} wejść/tydzień)"
+
+# Licznik wykorzystania puli grupy w danym tygodniu, podzielony na kilka wierszy (shardów).
+# Równoczesne wejścia członków trafiają w różne wiersze, więc rzadko czekają na tę samą blokadę
+class GroupPoolShard(models.Model):
+    group = models.ForeignKey(GroupAccount, on_delete=models.CASCADE, related_name='pool_shards')
+    week_start = models.DateField(verbose_name="Początek tygodnia")
+    shard = models.PositiveSmallIntegerField(verbose_name="Część puli")
+    allotment = models.PositiveIntegerField(verbose_name="Przydział wejść")
+    used = models.PositiveIntegerField(default=0, verbose_name="Wykorzystane")
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['group', 'week_start', 'shard'], name='group_pool_shard_uniq'),
+        ]
+        verbose_name = "Część puli wejść"
+        verbose_name_plural = "Części puli wejść"
+
 # Karnet użytkownika
 class UserMembership(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='memberships')
@@ -33,6 +132,13 @@ class UserMembership(models.Model):
     purchase_date = models.DateField(default=timezone.now)
     expiration_date = models.DateField()
     is_active = models.BooleanField(default=True)
+    # Cena z chwili zakupu - późniejsza zmiana cennika nie zmienia przychodów wstecz
+    price = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True, verbose_name="Cena zakupu")
+    order = models.ForeignKey(Order, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='memberships', verbose_name="Zamówienie")
+    # Karnet w koncie grupowym korzysta ze wspólnej puli wejść zamiast limitu z rodzaju karnetu
+    group = models.ForeignKey(GroupAccount, on_delete=models.SET_NULL, null=True, blank=True,
+                              related_name='memberships', verbose_name="Konto grupowe")
 
 
     def clean(self):
@@ -42,18 +148,92 @@ class UserMembership(models.Model):
     def save(self, *args, **kwargs):
         if not self.expiration_date and self.membership_type:
             self.expiration_date = self.purchase_date + timezone.timedelta(days=self.membership_type.duration_days)
-        super().save(*args, **kwargs)
+        if self.price is None and self.membership_type:
+            self.price = self.membership_type.price
+        # Zdarzenie w outboxie zapisuje się w tej samej transakcji (post_save)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+# Najdłuższe dozwolone zajęcia - ogranicza zakres skanowania indeksu przy szukaniu kolizji
+MAX_CLASS_DURATION = timedelta(minutes=240)
+
+# Usunięte zajęcia zostają w bazie (razem z zapisami) - domyślny manager ich nie zwraca
+class ActiveClassSessionManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
 
 # Zajęcia użytkownika
 class ClassSessions(models.Model):
     name = models.CharField(max_length=100, verbose_name="Nazwa zajęć")
-    date = models.DateTimeField(verbose_name="Data zajęć")
+    date = models.DateTimeField(verbose_name="Data zajęć", db_index=True)
+    duration_minutes = models.PositiveIntegerField(
+        default=60,
+        validators=[MinValueValidator(1), MaxValueValidator(MAX_CLASS_DURATION.seconds // 60)],
+        verbose_name="Czas trwania (min)"
+    )
+    end_date = models.DateTimeField(editable=False, verbose_name="Koniec zajęć")
+    room = models.CharField(max_length=50, blank=True, default="", verbose_name="Sala")
     capacity = models.PositiveIntegerField(verbose_name="Limit miejsc")
     participants = models.ManyToManyField(User, through='Enrollments', related_name='classes')
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False, verbose_name="Usunięto")
+
+    objects = ActiveClassSessionManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'date'], name='class_room_date_idx'),
+        ]
+        # Wyszukiwanie kolizji (clean, Enrollments.check_schedule) skanuje tylko MAX_CLASS_DURATION
+        # wstecz - limit pilnuje baza, więc nie obejdzie go ani shell, ani zapis masowy
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(duration_minutes__gte=1, duration_minutes__lte=MAX_CLASS_DURATION.seconds // 60),
+                name='class_duration_range',
+                violation_error_message=f"Zajęcia mogą trwać od 1 do {MAX_CLASS_DURATION.seconds // 60} minut.",
+            ),
+        ]
 
     def clean(self):
         if self.date and self.date < timezone.now():
             raise ValidationError("Data zajęć nie może być wcześniejsza niż obecna data.")
+        if self.date and self.room and self.duration_minutes:
+            end_date = self.date + timedelta(minutes=self.duration_minutes)
+            collision = ClassSessions.objects.filter(
+                room=self.room,
+                date__gt=self.date - MAX_CLASS_DURATION,
+                date__lt=end_date,
+                end_date__gt=self.date,
+            ).exclude(pk=self.pk).first()
+            if collision:
+                raise ValidationError({'room': f"Sala jest zajęta przez: {collision}."})
+
+    def save(self, *args, **kwargs):
+        self.end_date = self.date + timedelta(minutes=self.duration_minutes)
+        with transaction.atomic():
+            # Godziny zapisów zmieniamy tylko przy przesunięciu zajęć - nie przy zmianie nazwy, sali czy limitu
+            stored = None
+            if not self._state.adding:
+                stored = ClassSessions.all_objects.filter(pk=self.pk).values_list('date', 'end_date').first()
+            super().save(*args, **kwargs)
+            if stored is not None and stored != (self.date, self.end_date):
+                # Zapisy przechowują kopię godzin zajęć dla indeksu (user, starts_at).
+                # update() pomija sygnały - zdarzenia outboxa dopisujemy w tej samej transakcji
+                enrollments = Enrollments.objects.filter(class_session=self)
+                if enrollments.update(starts_at=self.date, ends_at=self.end_date):
+                    OutboxEvent.objects.bulk_create(
+                        [OutboxEvent.build(enrollment, 'updated') for enrollment in enrollments], batch_size=500
+                    )
+
+    # Zapisy zostają w bazie, ale dla systemów zewnętrznych (przypomnienia, księgowość) są odwołane -
+    # zdarzenia outboxa dla zajęć i każdego zapisu w tej samej transakcji co usunięcie
+    def soft_delete(self):
+        self.deleted_at = timezone.now()
+        with transaction.atomic():
+            super().save(update_fields=['deleted_at'])
+            events = [OutboxEvent.build(enrollment, 'cancelled') for enrollment in Enrollments.objects.filter(class_session=self)]
+            events.append(OutboxEvent.build(self, 'deleted'))
+            OutboxEvent.objects.bulk_create(events, batch_size=500)
 
     def __str__(self):
         return f"{self.name} - {self.date.strftime('%Y-%m-%d %H:%M')}"
@@ -71,9 +251,15 @@ class Enrollments(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     class_session = models.ForeignKey(ClassSessions, on_delete=models.CASCADE)
     signup_date = models.DateTimeField(auto_now_add=True)
+    # Kopia ClassSessions.date / end_date - kolizje sprawdzane bez joina po indeksie (user, starts_at)
+    starts_at = models.DateTimeField(editable=False)
+    ends_at = models.DateTimeField(editable=False)
 
     class Meta:
         unique_together = ('user', 'class_session')
+        indexes = [
+            models.Index(fields=['user', 'starts_at'], name='enrollment_user_start_idx'),
+        ]
         verbose_name = "Zapis"
         verbose_name_plural = "Zapisy"
 
@@ -86,13 +272,45 @@ class Enrollments(models.Model):
             user=self.user,
             is_active=True,
             expiration_date__gte=timezone.now().date()
-        ).exists()
+        ).select_related('membership_type').first()
         if not active_membership:
             raise ValidationError("Użytkownik nie ma aktywnego karnetu.")
 
+        self.check_schedule(active_membership.membership_type)
+
+    def check_schedule(self, membership_type):
+        starts_at = self.class_session.date
+        ends_at = self.class_session.end_date
+        day = timezone.localtime(starts_at).date()
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        day_end = timezone.make_aware(datetime.combine(day + timedelta(days=1), time.min))
+
+        # Jedno zapytanie zakresowe obejmuje zarówno dzień zajęć, jak i okno możliwych kolizji.
+        # Zapisy na usunięte zajęcia nie blokują terminu (join tylko po kluczu głównym)
+        bookings = Enrollments.objects.filter(
+            user=self.user,
+            starts_at__gte=min(day_start, starts_at - MAX_CLASS_DURATION),
+            starts_at__lt=max(day_end, ends_at),
+            class_session__deleted_at__isnull=True,
+        ).exclude(pk=self.pk).values_list('starts_at', 'ends_at')
+
+        classes_that_day = 0
+        for booked_start, booked_end in bookings:
+            if booked_start < ends_at and booked_end > starts_at:
+                raise ValidationError("Jesteś już zapisany/a na zajęcia w tym czasie.")
+            if day_start <= booked_start < day_end:
+                classes_that_day += 1
+
+        limit = membership_type.classes_per_day if membership_type else None
+        if limit is not None and classes_that_day >= limit:
+            raise ValidationError(f"Twój karnet pozwala na {limit} zajęcia dziennie.")
+
     def save(self, *args, **kwargs):
+        self.starts_at = self.class_session.date
+        self.ends_at = self.class_session.end_date
         self.clean()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='profile')
@@ -127,13 +345,22 @@ class Visit(models.Model):
     entry_time = models.DateTimeField(auto_now_add=True, verbose_name="Czas wyjścia")
     exit_time = models.DateTimeField(null=True, blank=True, verbose_name="Czas wejścia")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['-entry_time'], name='visit_entry_time_idx'),
+            models.Index(fields=['user', '-entry_time'], name='visit_user_entry_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         cutoff_time = timezone.now() - timedelta(hours=24)
-        old_visits = Visit.objects.filter(exit_time__isnull=True, entry_time__lt=cutoff_time)
-        for v in old_visits:
-            v.exit_time = v.entry_time + timedelta(hours=24)
-            v.save()
-        super().save(*args, **kwargs)
+        # Zamknięcie starych wizyt i zapis bieżącej (wraz ze zdarzeniami outboxa z post_save) w jednej transakcji
+        with transaction.atomic():
+            old_visits = Visit.objects.filter(exit_time__isnull=True, entry_time__lt=cutoff_time)
+            for v in old_visits:
+                v.exit_time = v.entry_time + timedelta(hours=24)
+                # Bez ponownego wywołania Visit.save - inaczej rekurencja po tych samych starych wizytach
+                super(Visit, v).save(update_fields=['exit_time'])
+            super().save(*args, **kwargs)
     @property
     def is_active(self):
         return self.exit_time is None
@@ -150,4 +377,132 @@ def create_user_profile(sender, instance, created, **kwargs):
 def save_user_profile(sender, instance, **kwargs):
     # Zabezpieczenie: próba zapisu profilu tylko jeśli istnieje
     if hasattr(instance, 'profile'):
-        instance.profile.save()
\ No newline at end of file
+        instance.profile.save()
+
+
+# Dziennik działań personelu - tylko dopisywanie. Wpisy trafiają do bazy paczkami (core.audit),
+# więc created_at to czas zdarzenia, a nie zapisu.
+class AuditLogQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        raise PermissionError("Dziennik zdarzeń nie może być modyfikowany.")
+
+    def delete(self):
+        raise PermissionError("Dziennik zdarzeń nie może być usuwany.")
+
+
+class AuditLog(models.Model):
+    created_at = models.DateTimeField(default=timezone.now, verbose_name="Czas")
+    actor = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='+', verbose_name="Wykonał")
+    # Kopia nazwy - wpis pozostaje czytelny po usunięciu konta
+    actor_name = models.CharField(max_length=150, verbose_name="Login wykonującego")
+    member = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+',
+                               verbose_name="Członek")
+    member_name = models.CharField(max_length=150, blank=True, default="", verbose_name="Login członka")
+    action = models.CharField(max_length=50, verbose_name="Akcja")
+    object_type = models.CharField(max_length=50, blank=True, default="", verbose_name="Typ obiektu")
+    object_id = models.CharField(max_length=64, blank=True, default="", verbose_name="ID obiektu")
+    details = models.JSONField(encoder=DjangoJSONEncoder, default=dict, blank=True, verbose_name="Szczegóły")
+
+    objects = AuditLogQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at'], name='audit_created_idx'),
+            models.Index(fields=['actor', '-created_at'], name='audit_actor_idx'),
+            models.Index(fields=['member', '-created_at'], name='audit_member_idx'),
+        ]
+        verbose_name = "Wpis dziennika"
+        verbose_name_plural = "Dziennik działań"
+
+    def __str__(self):
+        return f"{self.created_at:%Y-%m-%d %H:%M} {self.actor_name}: {self.action}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise PermissionError("Dziennik zdarzeń nie może być modyfikowany.")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise PermissionError("Dziennik zdarzeń nie może być usuwany.")
+
+
+# Transakcyjny outbox: zdarzenia dla systemów zewnętrznych (bramki, księgowość, przypomnienia)
+# wysyła w tle komenda dispatch_outbox
+class OutboxEvent(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Oczekuje'),
+        (SENT, 'Wysłane'),
+        (FAILED, 'Błąd'),
+    ]
+
+    event_type = models.CharField(max_length=64, verbose_name="Typ zdarzenia")
+    object_id = models.CharField(max_length=64, verbose_name="ID obiektu")
+    payload = models.JSONField(encoder=DjangoJSONEncoder, verbose_name="Dane")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Utworzono")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING, verbose_name="Status")
+    available_at = models.DateTimeField(default=timezone.now, verbose_name="Następna próba")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Liczba prób")
+    last_error = models.TextField(blank=True, default="", verbose_name="Ostatni błąd")
+    sent_at = models.DateTimeField(null=True, blank=True, verbose_name="Wysłano")
+    # Nazwy odbiorców (OUTBOX_SINKS), którzy już przyjęli zdarzenie
+    delivered_to = models.JSONField(default=list, blank=True, verbose_name="Dostarczono do")
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'available_at'], name='outbox_pending_idx'),
+        ]
+        verbose_name = "Zdarzenie (outbox)"
+        verbose_name_plural = "Zdarzenia (outbox)"
+
+    def __str__(self):
+        return f"{self.event_type} #{self.object_id} ({self.status})"
+
+    @classmethod
+    def build(cls, instance, action):
+        payload = {field.attname: field.value_from_object(instance) for field in instance._meta.concrete_fields}
+        return cls(
+            event_type=f"{instance._meta.model_name}.{action}",
+            object_id=str(instance.pk),
+            payload=payload,
+        )
+
+
+def record_outbox_save(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        OutboxEvent.build(instance, 'created' if created else 'updated').save()
+
+
+def record_outbox_delete(sender, instance, **kwargs):
+    OutboxEvent.build(instance, 'deleted').save()
+
+
+for outbox_model in (Visit, Enrollments, UserMembership):
+    post_save.connect(record_outbox_save, sender=outbox_model, dispatch_uid=f'outbox_save_{outbox_model.__name__}')
+    post_delete.connect(record_outbox_delete, sender=outbox_model, dispatch_uid=f'outbox_delete_{outbox_model.__name__}')
+
+
+# Znaczniki wersji dla cache fragmentów (wiersze recepcji, karty zajęć)
+def bump_member_versions(sender, instance, **kwargs):
+    if sender is Visit:
+        bump_version_on_commit('visit', instance.user_id)
+    elif sender is UserMembership:
+        bump_version_on_commit('membership', instance.user_id)
+    elif sender is Profile:
+        bump_version_on_commit('member', instance.user_id)
+    elif sender is User:
+        bump_version_on_commit('member', instance.pk)
+
+
+def bump_class_versions(sender, instance, **kwargs):
+    bump_version_on_commit('class', instance.class_session_id if sender is Enrollments else instance.pk)
+
+
+for versioned_model in (Visit, UserMembership, Profile, User):
+    post_save.connect(bump_member_versions, sender=versioned_model, dispatch_uid=f'version_save_{versioned_model.__name__}')
+    post_delete.connect(bump_member_versions, sender=versioned_model, dispatch_uid=f'version_delete_{versioned_model.__name__}')
+for versioned_model in (ClassSessions, Enrollments):
+    post_save.connect(bump_class_versions, sender=versioned_model, dispatch_uid=f'version_save_{versioned_model.__name__}')
+    post_delete.connect(bump_class_versions, sender=versioned_model, dispatch_uid=f'version_delete_{versioned_model.__name__}')
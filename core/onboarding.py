@@ -0,0 +1,89 @@
+import numpy as np
+
+from .models import Profile
+from .validators import PESEL_WEIGHTS
+
+# Przesunięcie miesiąca w PESEL (co 20) koduje stulecie urodzenia: 0->1900, 20->2000, ..., 80->1800
+PESEL_CENTURIES = np.array([1900, 2000, 2100, 2200, 1800])
+MONTH_DAYS = np.array([0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31])
+
+
+def _decode_pesels(pesels):
+    # Macierz n x 11 cyfr z jednego bufora ASCII
+    digits = np.frombuffer(''.join(pesels).encode('ascii'), dtype=np.uint8).reshape(-1, 11).astype(np.int64) - ord('0')
+
+    control = (10 - digits[:, :10] @ PESEL_WEIGHTS % 10) % 10
+    bad_checksum = control != digits[:, 10]
+
+    month_code = digits[:, 2] * 10 + digits[:, 3]
+    month = month_code % 20
+    year = PESEL_CENTURIES[month_code // 20] + digits[:, 0] * 10 + digits[:, 1]
+    day = digits[:, 4] * 10 + digits[:, 5]
+    leap = (year % 4 == 0) & ((year % 100 != 0) | (year % 400 == 0))
+    days_in_month = MONTH_DAYS[np.clip(month, 0, 12)] + (leap & (month == 2))
+    bad_date = (month < 1) | (month > 12) | (day < 1) | (day > days_in_month)
+
+    safe_month = np.where(bad_date, 1, month)
+    safe_day = np.where(bad_date, 1, day)
+    birth_dates = (
+        ((year - 1970) * 12 + safe_month - 1).astype('datetime64[M]').astype('datetime64[D]')
+        + (safe_day - 1).astype('timedelta64[D]')
+    )
+    genders = np.where(digits[:, 9] % 2 == 1, 'M', 'K')
+    return bad_checksum, bad_date, birth_dates, genders
+
+
+# Walidacja całej kolumny PESEL przed importem - niczego nie zapisuje,
+# duplikaty w bazie sprawdzane jednym zapytaniem IN na paczkę
+def validate_pesel_batch(values, check_database=True, chunk_size=500):
+    pesels = np.array(['' if value is None else str(value).strip() for value in values], dtype=object)
+    rows = [
+        {'index': i, 'pesel': pesel, 'birth_date': None, 'gender': None, 'duplicate_of': None, 'errors': []}
+        for i, pesel in enumerate(pesels.tolist())
+    ]
+    if not rows:
+        return {'rows': rows, 'error_count': 0, 'is_valid': True}
+
+    well_formed = np.fromiter(
+        (len(p) == 11 and p.isascii() and p.isdigit() for p in pesels), dtype=bool, count=len(pesels)
+    )
+    # Puste pole jest dozwolone, tak jak w Profile.pesel (blank=True)
+    for i in np.flatnonzero(~well_formed & (pesels != '')).tolist():
+        rows[i]['errors'].append("PESEL musi składać się z 11 cyfr.")
+
+    indices = np.flatnonzero(well_formed)
+    if indices.size:
+        bad_checksum, bad_date, birth_dates, genders = _decode_pesels(pesels[indices].tolist())
+        for i in indices[bad_checksum].tolist():
+            rows[i]['errors'].append("Niepoprawny numer PESEL (bład sumy kontrolnej)")
+        for i in indices[bad_date].tolist():
+            rows[i]['errors'].append("Niepoprawna data urodzenia w numerze PESEL.")
+        ok = ~bad_date
+        for i, birth_date, gender in zip(indices[ok].tolist(), birth_dates[ok].tolist(), genders[ok].tolist()):
+            rows[i]['birth_date'] = birth_date
+            rows[i]['gender'] = gender
+
+        # Duplikaty w pliku: każde kolejne wystąpienie wskazuje na pierwsze (duplicate_of to indeks
+        # z listy wejściowej - numerację wierszy pliku zna tylko wywołujący)
+        unique, first_index, inverse, counts = np.unique(
+            pesels[indices].astype(str), return_index=True, return_inverse=True, return_counts=True
+        )
+        duplicated = counts[inverse] > 1
+        first_rows = indices[first_index[inverse]]
+        for i, first in zip(indices[duplicated].tolist(), first_rows[duplicated].tolist()):
+            if i != first:
+                rows[i]['duplicate_of'] = first
+                rows[i]['errors'].append("Duplikat numeru PESEL w pliku.")
+
+        if check_database:
+            existing = set()
+            candidates = unique.tolist()
+            for start in range(0, len(candidates), chunk_size):
+                chunk = candidates[start:start + chunk_size]
+                existing.update(Profile.objects.filter(pesel__in=chunk).values_list('pesel', flat=True))
+            for i in indices.tolist():
+                if rows[i]['pesel'] in existing:
+                    rows[i]['errors'].append("Profil z tym numerem PESEL już istnieje.")
+
+    error_count = sum(1 for row in rows if row['errors'])
+    return {'rows': rows, 'error_count': error_count, 'is_valid': error_count == 0}
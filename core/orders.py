@@ -0,0 +1,130 @@
+import uuid
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Order, OutboxEvent, UserMembership
+from .versions import bump_version_on_commit
+
+MAX_ORDER_QUANTITY = 1000
+RECEIPT_MAX_ATTEMPTS = 3
+# Paragon pobrany przez proces, który w międzyczasie padł, wraca do kolejki po tym czasie
+RECEIPT_CLAIM_TIMEOUT = timedelta(minutes=10)
+
+
+class OrderError(Exception):
+    pass
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
+
+
+def place_order(buyer, membership_type, idempotency_key, recipients=None, company_name="", group=None):
+    recipients = [buyer] if recipients is None else list(recipients)
+    if not idempotency_key:
+        raise OrderError("Brak klucza zamówienia - odśwież stronę i spróbuj ponownie.")
+    if not recipients:
+        raise OrderError("Zamówienie musi zawierać co najmniej jeden karnet.")
+    if len(recipients) > MAX_ORDER_QUANTITY:
+        raise OrderError(f"Jedno zamówienie może zawierać najwyżej {MAX_ORDER_QUANTITY} karnetów.")
+
+    order = Order.objects.filter(buyer=buyer, idempotency_key=idempotency_key).first()
+    if order is None:
+        try:
+            with transaction.atomic():
+                return create_order(buyer, membership_type, idempotency_key, recipients, company_name, group), True
+        except IntegrityError:
+            # Równoległy request z tym samym kluczem zapisał zamówienie pierwszy
+            order = Order.objects.get(buyer=buyer, idempotency_key=idempotency_key)
+
+    if order.membership_type_id != membership_type.id or order.quantity != len(recipients):
+        raise OrderError("Ten klucz zamówienia został już użyty dla innego zakupu.")
+    return order, False
+
+
+def create_order(buyer, membership_type, idempotency_key, recipients, company_name, group=None):
+    today = timezone.now().date()
+    order = Order.objects.create(
+        buyer=buyer,
+        idempotency_key=idempotency_key,
+        membership_type=membership_type,
+        membership_name=membership_type.name,
+        unit_price=membership_type.price,
+        duration_days=membership_type.duration_days,
+        quantity=len(recipients),
+        total_price=membership_type.price * len(recipients),
+        company_name=company_name,
+    )
+    memberships = UserMembership.objects.bulk_create([
+        UserMembership(
+            user=user,
+            membership_type=membership_type,
+            order=order,
+            group=group,
+            price=membership_type.price,
+            purchase_date=today,
+            expiration_date=today + timedelta(days=membership_type.duration_days),
+        )
+        for user in recipients
+    ], batch_size=500)
+
+    # bulk_create pomija save() i sygnały - zdarzenia outboxa i znaczniki wersji uzupełniamy ręcznie
+    OutboxEvent.objects.bulk_create([OutboxEvent.build(m, 'created') for m in memberships], batch_size=500)
+    for user in recipients:
+        bump_version_on_commit('membership', user.pk)
+    return order
+
+
+def claim_receipts(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        # skip_locked pozwala uruchomić kilka procesów render_receipts równolegle (PostgreSQL)
+        ids = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(
+                Q(receipt_status=Order.RECEIPT_PENDING)
+                | Q(receipt_status=Order.RECEIPT_RENDERING, receipt_claimed_at__lt=now - RECEIPT_CLAIM_TIMEOUT)
+            )
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        Order.objects.filter(id__in=ids).update(receipt_status=Order.RECEIPT_RENDERING, receipt_claimed_at=now)
+    return ids
+
+
+def render_receipt(order_id):
+    try:
+        order = Order.objects.select_related('buyer').get(id=order_id)
+        html = render_to_string('core/receipt.html', {
+            'order': order,
+            'memberships': order.memberships.select_related('user').order_by('id'),
+        })
+        # Paragon trafia do niepublicznego magazynu (STORAGES['receipts']), pod nazwą ze skrótu treści
+        order.receipt.save(f'{order.id}.html', ContentFile(html.encode('utf-8')), save=False)
+        order.receipt_status = Order.RECEIPT_READY
+        order.receipt_error = ""
+        order.save(update_fields=['receipt', 'receipt_status', 'receipt_error'])
+        return True
+    except Exception as e:
+        Order.objects.filter(id=order_id).update(
+            receipt_attempts=F('receipt_attempts') + 1,
+            receipt_error=f"{type(e).__name__}: {e}",
+            receipt_status=Case(
+                When(receipt_attempts__gte=RECEIPT_MAX_ATTEMPTS - 1, then=Value(Order.RECEIPT_FAILED)),
+                default=Value(Order.RECEIPT_PENDING),
+            ),
+        )
+        return False
+    finally:
+        # Każdy wątek puli ma własne połączenie z bazą
+        connection.close()
+
+
+def render_pending_receipts(executor, batch_size=50):
+    ids = claim_receipts(batch_size)
+    return sum(executor.map(render_receipt, ids)), len(ids)
@@ -0,0 +1,160 @@
+import hashlib
+import hmac
+import json
+import urllib.request
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import OutboxEvent
+
+RETRY_BASE_SECONDS = 5
+RETRY_MAX_SECONDS = 60 * 60
+MAX_ATTEMPTS = 10
+# Paczka pobrana przez dispatcher, który w międzyczasie padł, wraca do kolejki po tym czasie
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def serialize_events(events):
+    return [
+        {
+            'id': event.id,
+            'type': event.event_type,
+            'object_id': event.object_id,
+            'created_at': event.created_at,
+            'payload': event.payload,
+        }
+        for event in events
+    ]
+
+
+# Odbiorcy zdarzeń - każdy dostaje zdarzenia, których jeszcze nie potwierdził; dostarczanie
+# "co najmniej raz", więc odbiorca powinien deduplikować po polu "id"
+class FileSink:
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def send(self, events):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self.path.open('a', encoding='utf-8') as f:
+            for event in serialize_events(events):
+                f.write(json.dumps(event, cls=DjangoJSONEncoder) + '\n')
+
+
+class HttpSink:
+    def __init__(self, url, timeout=5, headers=None):
+        self.url = url
+        self.timeout = timeout
+        self.headers = headers or {}
+
+    def build_headers(self, body):
+        return {'Content-Type': 'application/json', **self.headers}
+
+    def send(self, events):
+        body = json.dumps({'events': serialize_events(events)}, cls=DjangoJSONEncoder).encode('utf-8')
+        request = urllib.request.Request(self.url, data=body, headers=self.build_headers(body), method='POST')
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            if response.status >= 300:
+                raise RuntimeError(f"{self.url} odpowiedział kodem {response.status}")
+
+
+class WebhookSink(HttpSink):
+    def __init__(self, url, secret, **kwargs):
+        super().__init__(url, **kwargs)
+        self.secret = secret.encode('utf-8')
+
+    def build_headers(self, body):
+        signature = hmac.new(self.secret, body, hashlib.sha256).hexdigest()
+        return {**super().build_headers(body), 'X-GymManager-Signature': f'sha256={signature}'}
+
+
+def get_sinks():
+    sinks = []
+    for config in getattr(settings, 'OUTBOX_SINKS', []):
+        sink = import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+        # Nazwa zapisywana w OutboxEvent.delivered_to - musi być stała między uruchomieniami
+        sink.name = config.get('NAME', config['BACKEND'])
+        sinks.append(sink)
+    names = [sink.name for sink in sinks]
+    if len(set(names)) != len(names):
+        raise ImproperlyConfigured("Odbiorcy w OUTBOX_SINKS muszą mieć unikalne NAME.")
+    return sinks
+
+
+def retry_delay(attempts):
+    return timedelta(seconds=min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS))
+
+
+class DispatchError(Exception):
+    pass
+
+
+def claim_batch(batch_size):
+    now = timezone.now()
+    with transaction.atomic():
+        # Krótka transakcja tylko na pobranie paczki - wysyłka idzie już poza nią, więc wolny
+        # odbiorca nie blokuje zapisów (w SQLite otwarta transakcja blokuje całą bazę).
+        # skip_locked pozwala uruchomić kilka dispatcherów równolegle (PostgreSQL)
+        ids = list(
+            OutboxEvent.objects.select_for_update(skip_locked=True)
+            .filter(status=OutboxEvent.PENDING, available_at__lte=now)
+            .order_by('id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        # Dzierżawa: do upływu CLAIM_TIMEOUT paczki nie pobierze inny dispatcher
+        OutboxEvent.objects.filter(id__in=ids).update(available_at=now + CLAIM_TIMEOUT)
+    return ids
+
+
+def dispatch_batch(sinks, batch_size=100):
+    ids = claim_batch(batch_size)
+    if not ids:
+        return 0
+    events = list(OutboxEvent.objects.filter(id__in=ids).order_by('id'))
+
+    # Każdy odbiorca dostaje tylko zdarzenia, których jeszcze nie przyjął - błąd jednego
+    # nie powoduje ponownej wysyłki do pozostałych
+    errors = []
+    for sink in sinks:
+        pending = [event for event in events if sink.name not in event.delivered_to]
+        if not pending:
+            continue
+        try:
+            sink.send(pending)
+        except Exception as e:
+            errors.append(f"{sink.name}: {type(e).__name__}: {e}")
+            continue
+        for event in pending:
+            event.delivered_to = event.delivered_to + [sink.name]
+
+    now = timezone.now()
+    sent = 0
+    for event in events:
+        if all(sink.name in event.delivered_to for sink in sinks):
+            event.status = OutboxEvent.SENT
+            event.sent_at = now
+            event.last_error = ""
+            sent += 1
+        else:
+            event.attempts += 1
+            event.last_error = "; ".join(errors)
+            event.available_at = now + retry_delay(event.attempts)
+            if event.attempts >= MAX_ATTEMPTS:
+                event.status = OutboxEvent.FAILED
+    OutboxEvent.objects.bulk_update(
+        events, ['delivered_to', 'status', 'sent_at', 'attempts', 'last_error', 'available_at']
+    )
+
+    if errors:
+        raise DispatchError("; ".join(errors))
+    return sent
+
+
+def purge_sent(older_than):
+    return OutboxEvent.objects.filter(status=OutboxEvent.SENT, sent_at__lt=timezone.now() - older_than).delete()[0]
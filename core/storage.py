@@ -0,0 +1,73 @@
+import hashlib
+import os
+import posixpath
+import secrets
+
+from django.core.files.storage import FileSystemStorage
+
+# Przechowywanie plików po skrócie treści (SHA-256): ta sama treść trafia zawsze pod tę samą
+# nazwę, więc każde zdjęcie jest zapisane raz, niezależnie od tego, ile profili go używa.
+# Pliki są współdzielone - nie usuwamy ich razem z rekordem, który na nie wskazuje.
+
+
+class ContentAddressedMixin:
+    # profile_photos/ab/cd/abcd...jpg - po 256 katalogów na poziom, pojedynczy folder się nie rozrasta
+    shard_levels = 2
+    chunk_size = 64 * 1024
+
+    def hashed_name(self, name, digest):
+        directory = posixpath.dirname(name.replace('\\', '/'))
+        extension = os.path.splitext(name)[1].lower()
+        shards = [digest[i * 2:(i + 1) * 2] for i in range(self.shard_levels)]
+        return posixpath.join(directory, *shards, digest + extension)
+
+    def get_available_name(self, name, max_length=None):
+        # Nazwa wynika z treści - istniejący plik pod tą nazwą jest tym samym plikiem
+        return name
+
+    def _save(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks(self.chunk_size):
+            digest.update(chunk)
+        content.seek(0)
+        name = self.hashed_name(name, digest.hexdigest())
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+
+class HashedFileSystemStorage(ContentAddressedMixin, FileSystemStorage):
+    incoming_dir = '.incoming'
+
+    def _save(self, name, content):
+        # Jeden przebieg po danych: zapis do pliku tymczasowego z liczeniem skrótu, potem rename.
+        # Duże uploady (TemporaryUploadedFile) przechodzą kawałkami, bez wczytywania do pamięci.
+        incoming = os.path.join(self.location, self.incoming_dir)
+        os.makedirs(incoming, exist_ok=True)
+        tmp_path = os.path.join(incoming, secrets.token_hex(16))
+        mode = self.file_permissions_mode if self.file_permissions_mode is not None else 0o666
+        digest = hashlib.sha256()
+        try:
+            with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), mode), 'wb') as f:
+                for chunk in content.chunks(self.chunk_size):
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            name = self.hashed_name(name, digest.hexdigest())
+            full_path = self.path(name)
+            if not os.path.exists(full_path):
+                directory = os.path.dirname(full_path)
+                if self.directory_permissions_mode is not None:
+                    old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+                    try:
+                        os.makedirs(directory, self.directory_permissions_mode, exist_ok=True)
+                    finally:
+                        os.umask(old_umask)
+                else:
+                    os.makedirs(directory, exist_ok=True)
+                # Atomowe - równoległy zapis tej samej treści podmienia identyczny plik
+                os.replace(tmp_path, full_path)
+            return name
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,9 @@
+from storages.backends.s3 import S3Storage
+
+from .storage import ContentAddressedMixin
+
+
+# Wariant dla S3 i zgodnych (MinIO, Ceph, R2) - wymaga django-storages[s3].
+# Skrót liczony przed wysyłką; wysyłka strumieniowa (multipart) bez buforowania w pamięci.
+class HashedS3Storage(ContentAddressedMixin, S3Storage):
+    pass
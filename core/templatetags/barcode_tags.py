@@ -1,6 +1,3 @@
-import qrcode
-from io import BytesIO
-import base64
 from django import template
 
 register = template.Library()
@@ -10,6 +7,13 @@ def generate_barcode(value):
     if not value:
         return ""
     try:
+        # qrcode ciągnie za sobą Pillow - importujemy dopiero przy renderowaniu karty,
+        # a nie przy starcie każdego workera (Django ładuje biblioteki tagów przy starcie)
+        import base64
+        from io import BytesIO
+
+        import qrcode
+
         value = str(value)
 
         qr = qrcode.QRCode(
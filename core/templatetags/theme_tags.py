@@ -0,0 +1,19 @@
+import time
+
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html
+
+register = template.Library()
+
+
+# Odpowiednik {% tailwind_css %} bez zależności od aplikacji tailwind,
+# której nie ma w profilu produkcyjnym (CSS jest już zbudowany w theme/static)
+@register.simple_tag
+def theme_css():
+    url = static(getattr(settings, 'TAILWIND_CSS_PATH', 'css/dist/styles.css'))
+    if settings.DEBUG:
+        # Znacznik czasu wymusza przeładowanie CSS podczas pracy z "tailwind start"
+        url = f"{url}?v={int(time.time())}"
+    return format_html('<link rel="stylesheet" type="text/css" href="{}">', url)
@@ -0,0 +1,38 @@
+import time
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+# Znaczniki wersji danych do kluczy cache fragmentów szablonów.
+# Brakujący znacznik (np. po restarcie cache) dostaje nową wartość z zegara,
+# więc nigdy nie trafi w stary fragment zapisany pod wcześniejszą wersją.
+
+
+def _key(kind, pk):
+    return f'dataversion:{kind}:{pk}'
+
+
+def bump_version(kind, pk):
+    key = _key(kind, pk)
+    if not cache.add(key, time.time_ns(), None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+# Znacznik podbijany dopiero po COMMIT - request czytający w trakcie transakcji nie zapisze
+# starych danych pod nową wersją. Poza transakcją działa od razu.
+def bump_version_on_commit(kind, pk):
+    transaction.on_commit(partial(bump_version, kind, pk))
+
+
+def get_versions(kind, pks):
+    keys = {_key(kind, pk): pk for pk in pks}
+    found = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in found}
+    if missing:
+        cache.set_many(missing, None)
+        found.update(missing)
+    return {keys[key]: value for key, value in found.items()}
@@ -1,18 +1,32 @@
-from datetime import timedelta
+import asyncio
+import json
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
 
 from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
-from django.db.models import Sum, Count
+from django.core.paginator import Paginator
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Sum, Count, Q, OuterRef, Subquery, Prefetch
 from django.db.models.functions import TruncMonth
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.template.loader import render_to_string
+from django.views.decorators.http import require_POST
 from django.contrib.auth import login
 from django.contrib import messages
+from django.db import transaction
 from django.utils import timezone
 
-from .forms import SignUpForm, ProfileForm, ClassSessionForm
-from .models import UserMembership, MembershipType, Visit, ClassSessions, Enrollments
+from . import audit
+from .groups import consume_entry, current_week_start, pool_usage, remaining_entries
+from .forms import SignUpForm, ProfileForm, ClassSessionForm, CorporatePurchaseForm, AuditLogFilterForm
+from .models import UserMembership, MembershipType, Visit, ClassSessions, Enrollments, OutboxEvent, Order, AuditLog
+from .orders import OrderError, new_idempotency_key, place_order
+from .versions import get_versions
 
 
 def home(request):
@@ -47,108 +61,300 @@ def dashboard(request):
         is_active=True,
         expiration_date__gte=timezone.now().date()
     ).first()
+    recent_orders = request.user.orders.order_by('-created_at')[:5]
 
     return render(request, 'core/dashboard.html', {
         'active_membership': active_membership,
-        'recent_visits': recent_visits
+        'recent_visits': recent_visits,
+        'recent_orders': recent_orders,
     })
 
 @login_required
 def membership_list(request):
     memberships = MembershipType.objects.all()
+    # Osobny klucz na każdą kartę - podwójne kliknięcie wyśle ten sam klucz
+    for membership in memberships:
+        membership.idempotency_key = new_idempotency_key()
     return render(request, 'core/membership_list.html', {'memberships': memberships})
 
 @login_required
 def purchase_membership(request, membership_id):
     if request.method == 'POST':
         membership_type = get_object_or_404(MembershipType, id=membership_id)
-        UserMembership.objects.create(
-            user=request.user,
-            membership_type=membership_type
-        )
-        messages.success(request, f"Gratulacje! Kupiłeś karnet: {membership_type.name}.")
+        idempotency_key = request.headers.get('Idempotency-Key') or request.POST.get('idempotency_key')
+        try:
+            order, created = place_order(request.user, membership_type, idempotency_key)
+        except OrderError as e:
+            messages.error(request, str(e))
+            return redirect('membership_list')
+        if created:
+            messages.success(request, f"Gratulacje! Kupiłeś karnet: {membership_type.name}.")
+        else:
+            messages.info(request, f"Zamówienie #{order.id} zostało już przyjęte - karnet nie został kupiony ponownie.")
         return redirect('dashboard')
     return redirect('membership_list')
 
 @staff_member_required
-def reception_panel(request):
-    users = User.objects.filter(is_superuser=False, is_staff=False).select_related('profile')
-    users_with_status = []
+def corporate_purchase(request):
+    if request.method == 'POST':
+        form = CorporatePurchaseForm(request.POST)
+        if form.is_valid():
+            try:
+                order, created = place_order(
+                    request.user,
+                    form.cleaned_data['membership_type'],
+                    form.cleaned_data['idempotency_key'],
+                    recipients=form.cleaned_data['recipients'],
+                    company_name=form.cleaned_data['company_name'],
+                    group=form.cleaned_data['group'],
+                )
+            except OrderError as e:
+                messages.error(request, str(e))
+            else:
+                if created:
+                    audit.record(request.user, 'order.create', obj=order, company=order.company_name,
+                                 quantity=order.quantity, total=order.total_price)
+                    messages.success(request, f"Zamówienie #{order.id}: {order.quantity} karnetów dla {order.company_name}.")
+                else:
+                    messages.info(request, f"Zamówienie #{order.id} zostało już przyjęte wcześniej.")
+                return redirect('admin_dashboard')
+    else:
+        form = CorporatePurchaseForm(initial={'idempotency_key': new_idempotency_key()})
+
+    return render(request, 'core/corporate_purchase.html', {'form': form})
+
+@login_required
+def order_receipt(request, order_id):
+    order = get_object_or_404(Order, id=order_id)
+    if order.buyer_id != request.user.id and not request.user.is_staff:
+        raise Http404
+    if order.receipt_status != Order.RECEIPT_READY:
+        messages.info(request, "Paragon jest jeszcze przygotowywany - spróbuj za chwilę.")
+        return redirect('dashboard')
+    return FileResponse(order.receipt.open('rb'), content_type='text/html; charset=utf-8')
+
+def start_of_current_week():
     now = timezone.now()
     start_of_week = now - timedelta(days=now.weekday())
-    start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-    for user in users:
-        last_visit = user.visits.last()
-        in_gym = last_visit and last_visit.exit_time is None
-        visit_id = None
+    return start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
 
-        if last_visit and last_visit.exit_time is None:
-            in_gym = True
-            visit_id = last_visit.id
 
-        active_membership = user.memberships.filter(
+def reception_members(users):
+    today = timezone.localdate()
+    # Wszystko w 2 zapytaniach zamiast kilku na każdego członka
+    open_visit = Visit.objects.filter(user=OuterRef('pk'), exit_time__isnull=True).order_by('-id')
+    users = users.select_related('profile').annotate(
+        visit_id=Subquery(open_visit.values('id')[:1]),
+        visits_count=Count('visits', filter=Q(visits__entry_time__gte=start_of_current_week())),
+    ).prefetch_related(Prefetch(
+        'memberships',
+        queryset=UserMembership.objects.filter(
             is_active=True,
-            expiration_date__gte=timezone.now().date()
-        ).select_related('membership_type').first()
+            expiration_date__gte=today
+        ).select_related('membership_type', 'group').order_by('id'),
+        to_attr='active_memberships'
+    ))
+    users = list(users)
+
+    # Wykorzystanie pul grupowych jednym zapytaniem po licznikach, bez liczenia wizyt
+    group_ids = {m.group_id for user in users for m in user.active_memberships[:1] if m.group_id}
+    group_used = pool_usage(group_ids, current_week_start()) if group_ids else {}
 
+    members = []
+    for user in users:
+        active_membership = user.active_memberships[0] if user.active_memberships else None
+        group = active_membership.group if active_membership else None
         limit = None
         visits_count = 0
-
-        if active_membership and active_membership.membership_type.entries_per_week:
+        if group:
+            limit = group.entries_per_week
+            visits_count = group_used.get(group.id, 0)
+        elif active_membership and active_membership.membership_type and active_membership.membership_type.entries_per_week:
             limit = active_membership.membership_type.entries_per_week
-            visits_count = user.visits.filter(entry_time__gte=start_of_week).count()
+            visits_count = user.visits_count
 
-        users_with_status.append({
+        members.append({
             'user': user,
-            'in_gym': in_gym,
-            'visit_id': visit_id,
+            'in_gym': user.visit_id is not None,
+            'visit_id': user.visit_id,
             'active_membership': active_membership,
+            'group': group,
             'limit': limit,
-            'visits_count': visits_count
+            'visits_count': visits_count,
         })
-    return render(request, 'core/reception_panel.html', {'users_with_status': users_with_status})
+    return members
+
+
+# Stan wiersza recepcji wysyłany do przeglądarki (SSE / odpowiedź JSON) - komórka karnetu
+# jako gotowy HTML, żeby zakup lub zmiana karnetu była widoczna bez przeładowania
+def member_status(item):
+    return {
+        'user': item['user'].id,
+        'in_gym': item['in_gym'],
+        'visits_count': item['visits_count'],
+        'limit': item['limit'],
+        'membership_html': render_to_string('core/reception_membership.html', {'item': item}),
+    }
+
 
 @staff_member_required
+def reception_panel(request):
+    today = timezone.localdate()
+    users_with_status = reception_members(User.objects.filter(is_superuser=False, is_staff=False))
+
+    user_ids = [item['user'].id for item in users_with_status]
+    member_versions = get_versions('member', user_ids)
+    membership_versions = get_versions('membership', user_ids)
+    visit_versions = get_versions('visit', user_ids)
+    for item in users_with_status:
+        user_id = item['user'].id
+        membership = item['active_membership']
+        # Znaczniki wersji są poprawne między workerami tylko przy wspólnym cache (np. Redis) -
+        # dlatego dane zmieniane przy recepcji (karnet, licznik, otwarta wizyta) są w kluczu wprost.
+        # Licznik w kluczu - wejście innego członka grupy zmienia też ten wiersz
+        item['version'] = (f"{member_versions[user_id]}.{membership_versions[user_id]}.{visit_versions[user_id]}."
+                           f"{membership.id if membership else 0}.{membership.expiration_date if membership else ''}."
+                           f"{item['visit_id'] or 0}.{item['limit']}.{item['visits_count']}.{today}")
+
+    return render(request, 'core/reception_panel.html', {
+        'users_with_status': users_with_status,
+        'last_event_id': OutboxEvent.objects.order_by('-id').values_list('id', flat=True).first() or 0,
+    })
+
+
+def toggle_response(request, user, level, text):
+    # Tryb na żywo (fetch z panelu) dostaje JSON ze stanem wiersza zamiast przekierowania
+    if request.headers.get('Accept') == 'application/json':
+        item = reception_members(User.objects.filter(id=user.id))[0]
+        return JsonResponse({'level': level, 'message': text, 'member': member_status(item)})
+    messages.add_message(request, level, text)
+    return redirect('reception_panel')
+
+
+@staff_member_required
+@require_POST
 def toggle_visit(request, user_id):
     user = get_object_or_404(User, id=user_id)
     active_visit = Visit.objects.filter(user=user, exit_time__isnull=True).last()
     if active_visit:
         active_visit.exit_time = timezone.now()
         active_visit.save()
-        messages.info(request, f"Zakończono wizytę dla {user.username}.")
-    else:
-        active_membership = UserMembership.objects.filter(
+        audit.record(request.user, 'visit.exit', member=user, obj=active_visit)
+        return toggle_response(request, user, messages.INFO, f"Zakończono wizytę dla {user.username}.")
+
+    active_membership = UserMembership.objects.filter(
+        user=user,
+        is_active=True,
+        expiration_date__gte=timezone.now().date()
+    ).select_related('membership_type', 'group').first()
+
+    if not active_membership:
+        audit.record(request.user, 'visit.denied', member=user, reason='no_membership')
+        return toggle_response(request, user, messages.ERROR, f"Użytkownik {user.username} nie ma aktywnego karnetu.")
+
+    group = active_membership.group
+    if group is not None:
+        week_start = current_week_start()
+        with transaction.atomic():
+            if not consume_entry(group, week_start):
+                audit.record(request.user, 'visit.denied', member=user, reason='group_pool', group=group.name)
+                return toggle_response(request, user, messages.ERROR, f"Pula wejść grupy {group.name} na ten tydzień została wykorzystana")
+            visit = Visit.objects.create(user=user)
+        audit.record(request.user, 'visit.entry', member=user, obj=visit, group=group.name)
+        remaining = remaining_entries(group, week_start)
+        return toggle_response(request, user, messages.SUCCESS, f"{user.username}! (Pula grupy {group.name}: pozostało {remaining})")
+
+    limit = active_membership.membership_type.entries_per_week
+    if limit is not None:
+        visits_this_week = Visit.objects.filter(
             user=user,
-            is_active=True,
-            expiration_date__gte=timezone.now().date()
-        ).select_related('membership_type').first()
-
-        if not active_membership:
-            messages.error(request, f"Użytkownik {user.username} nie ma aktywnego karnetu.")
-            return redirect('reception_panel')
-        limit = active_membership.membership_type.entries_per_week
-        if limit is not None:
-            now = timezone.now()
-            start_of_week = now - timedelta(days=now.weekday())
-            start_of_week = start_of_week.replace(hour=0, minute=0, second=0, microsecond=0)
-            visits_this_week = Visit.objects.filter(
-                user=user,
-                entry_time__gte=start_of_week,
-            ).count()
-            if visits_this_week >= limit:
-                messages.error(request, f"{user.username} wykorzystał limit wejść w tym tygodniu")
-                return redirect('reception_panel')
-        Visit.objects.create(user=user)
-        if limit:
-            remaining = limit - (visits_this_week + 1)
-            messages.success(request, f"{user.username}! (Pozostało wejść w tym tyg: {remaining})")
-        else:
-            messages.success(request, f"{user.username}! (Karnet OPEN)")
-    return redirect('reception_panel')
+            entry_time__gte=start_of_current_week(),
+        ).count()
+        if visits_this_week >= limit:
+            audit.record(request.user, 'visit.denied', member=user, reason='weekly_limit', limit=limit)
+            return toggle_response(request, user, messages.ERROR, f"{user.username} wykorzystał limit wejść w tym tygodniu")
+    visit = Visit.objects.create(user=user)
+    audit.record(request.user, 'visit.entry', member=user, obj=visit, membership=active_membership.membership_type.name)
+    if limit:
+        remaining = limit - (visits_this_week + 1)
+        return toggle_response(request, user, messages.SUCCESS, f"{user.username}! (Pozostało wejść w tym tyg: {remaining})")
+    return toggle_response(request, user, messages.SUCCESS, f"{user.username}! (Karnet OPEN)")
+
+
+LIVE_POLL_SECONDS = 1
+LIVE_HEARTBEAT_SECONDS = 15
+# Identyfikatory zdarzeń są nadawane przy INSERT, a widoczne dopiero po COMMIT - przy kilku
+# stanowiskach naraz wiersz o niższym id może pojawić się po wyższym. Dlatego każde odpytanie
+# czyta też ostatnie LIVE_REPLAY_WINDOW id przed kursorem i pomija już wysłane.
+LIVE_REPLAY_WINDOW = 500
+
+
+def changed_members(last_id, seen):
+    events = list(
+        OutboxEvent.objects.filter(id__gt=max(last_id - LIVE_REPLAY_WINDOW, 0)).filter(
+            Q(event_type__startswith='visit.') | Q(event_type__startswith='usermembership.')
+        ).exclude(id__in=seen).order_by('id').values_list('id', 'payload')
+    )
+    if not events:
+        return last_id, []
+    last_id = max(last_id, events[-1][0])
+    seen.update(event_id for event_id, _ in events)
+    seen.difference_update({event_id for event_id in seen if event_id <= last_id - LIVE_REPLAY_WINDOW})
+    user_ids = {payload['user_id'] for _, payload in events}
+    # Wejście członka grupy zmienia licznik puli widoczny u pozostałych członków
+    group_ids = UserMembership.objects.filter(user_id__in=user_ids, group__isnull=False).values('group_id')
+    user_ids |= set(UserMembership.objects.filter(
+        group_id__in=group_ids, is_active=True, expiration_date__gte=timezone.localdate()
+    ).values_list('user_id', flat=True))
+    members = reception_members(User.objects.filter(id__in=user_ids, is_superuser=False, is_staff=False))
+    return last_id, [member_status(item) for item in members]
+
+
+# Strumień SSE ze zmienionymi wierszami recepcji. Źródłem jest tabela outboxa,
+# więc widać zmiany z każdego procesu: innych stanowisk i czytników kart.
+@staff_member_required
+async def reception_events(request):
+    if not isinstance(request, ASGIRequest):
+        # Pod WSGI strumień zablokowałby wątek serwera - 204 wyłącza EventSource
+        return HttpResponse(status=204)
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.GET.get('last', 0))
+    except ValueError:
+        last_id = 0
+
+    async def stream():
+        nonlocal last_id
+        # Po wznowieniu połączenia okno przed kursorem jest czytane ponownie - stan wiersza
+        # to pełny stan z bazy, więc powtórka jest nieszkodliwa (przeglądarka i tak pomija identyczne)
+        seen = set()
+        idle = 0
+        yield "retry: 3000\n\n"
+        while True:
+            last_id, changes = await sync_to_async(changed_members)(last_id, seen)
+            for status in changes:
+                yield f"id: {last_id}\nevent: member\ndata: {json.dumps(status)}\n\n"
+            idle = 0 if changes else idle + LIVE_POLL_SECONDS
+            if idle >= LIVE_HEARTBEAT_SECONDS:
+                idle = 0
+                yield ": ping\n\n"
+            await asyncio.sleep(LIVE_POLL_SECONDS)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required()
 def class_schedule(request):
-    upcoming_classes = ClassSessions.objects.filter(date__gte=timezone.now()).order_by('date').prefetch_related('participants__profile')
-    user_enrollments = Enrollments.objects.filter(user=request.user).values_list('class_session_id', flat=True)
+    # Lista uczestników renderuje się tylko przy pustym cache karty, więc bez prefetch
+    upcoming_classes = list(
+        ClassSessions.objects.filter(date__gte=timezone.now()).order_by('date').annotate(enrolled_count=Count('enrollments'))
+    )
+    class_versions = get_versions('class', [item.id for item in upcoming_classes])
+    for item in upcoming_classes:
+        item.version = class_versions[item.id]
+    user_enrollments = set(Enrollments.objects.filter(user=request.user).values_list('class_session_id', flat=True))
     return render(request, 'core/class_schedule.html', {
         'classes': upcoming_classes,
         'upcoming_classes': upcoming_classes,
@@ -156,23 +362,42 @@ def class_schedule(request):
     })
 @staff_member_required()
 def create_class(request):
+    # NumPy (prognozy) ładowany dopiero przy pierwszym użyciu, nie przy starcie workera
+    from .forecast import forecast_session
+
+    forecast = None
     if request.method == 'POST':
         form = ClassSessionForm(request.POST)
         if form.is_valid():
-            form.save()
-            messages.success(request, 'Zajęcia zostały dodane.')
-            return redirect('class_schedule')
+            forecast = forecast_session(form.instance)
+            if 'preview' not in request.POST:
+                class_session = form.save()
+                audit.record(request.user, 'class.create', obj=class_session, name=class_session.name,
+                             date=timezone.localtime(class_session.date), room=class_session.room, capacity=class_session.capacity)
+                messages.success(request, 'Zajęcia zostały dodane.')
+                if forecast:
+                    messages.info(request, forecast_message(forecast, form.instance.capacity))
+                return redirect('class_schedule')
     else:
         form = ClassSessionForm()
 
-    return render(request, 'core/create_class.html', {'form': form})
+    return render(request, 'core/create_class.html', {'form': form, 'forecast': forecast})
+
+def forecast_message(forecast, capacity):
+    text = f"Prognoza: {forecast['predicted']}/{capacity} miejsc ({forecast['fill_rate']}%)"
+    if forecast['sellout_at']:
+        text += f", wyprzedanie ok. {timezone.localtime(forecast['sellout_at']):%d.%m %H:%M}"
+    return text + "."
 
 @staff_member_required
 def delete_class(request, class_id):
     if request.method == 'POST':
         class_session = get_object_or_404(ClassSessions, id=class_id)
         class_name = class_session.name
-        class_session.delete()
+        # Miękkie usunięcie - zapisy uczestników zostają w bazie, zajęcia znikają z grafiku
+        class_session.soft_delete()
+        audit.record(request.user, 'class.delete', obj=class_session, name=class_name, date=timezone.localtime(class_session.date),
+                     enrolled=class_session.enrollments_set.count())
         messages.success(request, f'Zajęcia "{class_name}" zostały usunięte.')
         return redirect('class_schedule')
     return redirect('class_schedule')
@@ -205,11 +430,13 @@ def signout_from_class(request, class_id):
     return redirect('class_schedule')
 @staff_member_required
 def admin_dashboard(request):
+    from .forecast import forecast_timetable
+
     now = timezone.now()
     monthly_revenue = UserMembership.objects.filter(
         purchase_date__month=now.month,
         purchase_date__year=now.year
-    ).aggregate(total=Sum('membership_type__price'))['total'] or 0
+    ).aggregate(total=Sum('price'))['total'] or 0
 
     users_queryset = User.objects.filter(
         memberships__is_active=True,
@@ -230,7 +457,7 @@ def admin_dashboard(request):
     historical_revenue = UserMembership.objects.annotate(
         month=TruncMonth('purchase_date')
     ).values('month').annotate(
-        total=Sum('membership_type__price')
+        total=Sum('price')
     ).order_by('-month')[:12]
 
     return render(request, 'core/admin_dashboard.html', {
@@ -239,4 +466,52 @@ def admin_dashboard(request):
         'active_members': active_members_list,
         'current_date': now,
         'historical_revenue': historical_revenue,
-    })
\ No newline at end of file
+        'timetable_forecast': forecast_timetable(now=now),
+    })
+
+@staff_member_required
+def analytics_report(request):
+    # NumPy ładowany dopiero przy pierwszym raporcie, nie przy starcie workera
+    from .analytics import get_daily_report
+
+    report = get_daily_report()
+    return render(request, 'core/analytics.html', {'report': report})
+
+
+AUDIT_PAGE_SIZE = 50
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+@staff_member_required
+def audit_log(request):
+    form = AuditLogFilterForm(request.GET or None)
+    entries = AuditLog.objects.order_by('-created_at', '-id')
+    if form.is_valid():
+        data = form.cleaned_data
+        # Login zamieniamy na id wcześniej - filtr idzie po indeksie (actor/member, created_at).
+        # Konta już nie ma - szukamy po zapisanej w dzienniku kopii loginu
+        for field in ('actor', 'member'):
+            if data[field]:
+                user_id = User.objects.filter(username=data[field]).values_list('id', flat=True).first()
+                if user_id:
+                    entries = entries.filter(**{f'{field}_id': user_id})
+                else:
+                    entries = entries.filter(**{f'{field}_name': data[field]})
+        # Zakres dat jako przedział czasu (a nie __date), żeby baza mogła użyć indeksu
+        if data['date_from']:
+            entries = entries.filter(created_at__gte=day_start(data['date_from']))
+        if data['date_to']:
+            entries = entries.filter(created_at__lt=day_start(data['date_to'] + timedelta(days=1)))
+        if data['action']:
+            entries = entries.filter(action__startswith=data['action'])
+
+    query = request.GET.copy()
+    query.pop('page', None)
+    return render(request, 'core/audit_log.html', {
+        'form': form,
+        'page': Paginator(entries, AUDIT_PAGE_SIZE).get_page(request.GET.get('page')),
+        'query': query.urlencode(),
+    })